@@ -7,6 +7,8 @@ import sys
 import time
 from pathlib import Path
 
+import numpy as np
+
 sys.path.insert(0, str(Path(__file__).parent))
 
 from src.sensors import SensorManager
@@ -16,9 +18,13 @@ def calibrate_pH():
     print("You will need pH buffer solutions: pH 4.0, 7.0, and 10.0")
     input("Press Enter when ready...")
     
-    calibration_points = {}
+    buffer_pHs = np.array([4.0, 7.0, 10.0])
+    
+    # Here you would actually read the sensor, e.g. average a batch of
+    # ADC samples per buffer: voltages[i] = samples.mean()
+    voltages = 2.5 + (buffer_pHs - 7.0) * 0.18  # Simulated
     
-    for pH_value in [4.0, 7.0, 10.0]:
+    for pH_value, voltage in zip(buffer_pHs.tolist(), voltages.tolist()):
         print(f"\nPlace sensor in pH {pH_value} buffer solution")
         input("Press Enter when sensor is stable...")
         
@@ -26,12 +32,10 @@ def calibrate_pH():
         print("Reading voltage...")
         time.sleep(2)
         
-        # Here you would actually read the sensor
-        voltage = 2.5 + (pH_value - 7.0) * 0.18  # Simulated
-        
-        calibration_points[pH_value] = voltage
         print(f"Voltage reading: {voltage:.3f}V")
     
+    calibration_points = dict(zip(buffer_pHs.tolist(), voltages.tolist()))
+    
     print("\nCalibration points collected:")
     for pH, voltage in calibration_points.items():
         print(f"  pH {pH}: {voltage:.3f}V")
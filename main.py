@@ -5,48 +5,133 @@ Main Application Entry Point
 """
 
 import argparse
+import atexit
+import os
 import sys
+import glob
+import json
+import queue
 import signal
+import threading
 import time
 import logging
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
 from datetime import datetime, timedelta
 import yaml
 
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+from src.config import load_settings, validate_config
 from src.sensors import SensorManager
-from src.analyzer import WaterQualityAnalyzer
 from src.classifier import WaterQualityClassifier
 from src.alerts import AlertManager
 from src.data_handler import DataHandler
-from src.web_dashboard import create_app
 
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('logs/aquasentinel.log'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+# Setup logging: callers only enqueue records, a background listener
+# thread does the file/console I/O off the measurement loop
+_log_handlers = [
+    logging.FileHandler('logs/aquasentinel.log'),
+    logging.StreamHandler(sys.stdout)
+]
+for _handler in _log_handlers:
+    _handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+
+_log_queue = queue.SimpleQueue()
+_log_queue_handler = QueueHandler(_log_queue)
+_log_queue_handler.setFormatter(logging.Formatter('%(message)s'))
+_log_listener = QueueListener(_log_queue, *_log_handlers)
+
+logging.basicConfig(level=logging.INFO, handlers=[_log_queue_handler])
+_log_listener.start()
 logger = logging.getLogger(__name__)
 
 
+def stop_log_listener():
+    """Drain queued log records and switch back to direct logging"""
+    global _log_listener
+    if _log_listener is None:
+        return
+    _log_listener.stop()
+    _log_listener = None
+    
+    root = logging.getLogger()
+    root.removeHandler(_log_queue_handler)
+    for handler in _log_handlers:
+        root.addHandler(handler)
+
+
+atexit.register(stop_log_listener)
+
+SENSOR_KEYS = ('pH', 'turbidity', 'temperature')
+
+_REPORT_RULE = "=" * 60
+_REPORT_SECTION_RULE = "-" * 60
+
+_REPORT_TMPL = f"""{_REPORT_RULE}
+AquaSentinel-Pi5 Water Quality Report
+{_REPORT_RULE}
+
+Report Period: {{days}} days
+Generated: {{generated}}
+
+{_REPORT_SECTION_RULE}
+STATISTICS
+{_REPORT_SECTION_RULE}
+Total Readings: {{count}}
+Average pH: {{avg_pH:.2f}}
+Average Turbidity: {{avg_turbidity:.2f}} NTU
+Average Temperature: {{avg_temperature:.2f}}°C
+
+{_REPORT_SECTION_RULE}
+WATER QUALITY DISTRIBUTION
+{_REPORT_SECTION_RULE}
+{{distribution}}
+{_REPORT_SECTION_RULE}
+POLLUTION EVENTS
+{_REPORT_SECTION_RULE}
+Total Events: {{event_count}}
+
+{{events}}{_REPORT_RULE}
+"""
+
+_REPORT_DIST_TMPL = "{quality}: {count} ({percentage:.1f}%)\n"
+
+_REPORT_EVENT_TMPL = """[{timestamp}] {event_type}
+  Severity: {severity}
+  Description: {description}
+
+"""
+
+
 class AquaSentinelMonitor:
     """Main water quality monitoring system"""
     
     def __init__(self, config_path='config.yaml'):
         """Initialize the monitoring system"""
         self.running = False
+        self._wake = threading.Event()
+        self._report_cache = {}
         self.config = self.load_config(config_path)
         
+        # load_config() already rejected a malformed config, before any
+        # hardware is touched
+        try:
+            self.settings = load_settings(self.config, validate=False)
+        except ValueError as e:
+            logger.error(f"Invalid configuration: {e}")
+            sys.exit(1)
+        
         logger.info("Initializing AquaSentinel-Pi5 monitoring system...")
         
         try:
             # Initialize components
-            self.data_handler = DataHandler(self.config['database']['path'])
+            self.data_handler = DataHandler(self.settings.db_path)
             self.sensor_manager = SensorManager(self.config['sensors'])
-            self.analyzer = WaterQualityAnalyzer(self.config['thresholds'])
+            self.analyzer = None  # Created on demand by start()
             self.classifier = WaterQualityClassifier(self.config['thresholds'])
             self.alert_manager = AlertManager(
                 self.config['alerts'],
@@ -54,16 +139,41 @@ class AquaSentinelMonitor:
             )
             
             logger.info("System initialization complete")
-            
+        
         except Exception as e:
             logger.error(f"Failed to initialize system: {e}")
             raise
+        
+        # Signal handlers can only be installed from the main thread
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGINT, self.signal_handler)
+            signal.signal(signal.SIGTERM, self.signal_handler)
     
     def load_config(self, config_path):
-        """Load configuration from YAML file"""
+        """
+        Load configuration from YAML file
+        
+        The parsed config is cached in a JSON sidecar keyed on the YAML
+        file's mtime, so repeated CLI invocations skip the YAML parser.
+        Only configs that pass schema validation are cached, so a cache
+        hit skips validation as well.
+        """
         try:
+            mtime = os.stat(config_path).st_mtime_ns
+            cache_path = f"{config_path}.{mtime}.json"
+            
+            try:
+                with open(cache_path, 'r') as f:
+                    config = json.load(f)
+                logger.info(f"Configuration loaded from {config_path} (cached)")
+                return config
+            except (OSError, ValueError):
+                pass
+            
             with open(config_path, 'r') as f:
-                config = yaml.safe_load(f)
+                config = yaml.load(f, Loader=_YamlLoader)
+            validate_config(config)
+            self._write_config_cache(config_path, cache_path, config)
             logger.info(f"Configuration loaded from {config_path}")
             return config
         except FileNotFoundError:
@@ -72,69 +182,119 @@ class AquaSentinelMonitor:
         except yaml.YAMLError as e:
             logger.error(f"Invalid YAML configuration: {e}")
             sys.exit(1)
+        except ValueError as e:
+            logger.error(f"Invalid configuration: {e}")
+            sys.exit(1)
+    
+    def _write_config_cache(self, config_path, cache_path, config):
+        """Atomically write the JSON config cache and drop stale ones"""
+        tmp_path = f"{cache_path}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(config, f)
+            os.replace(tmp_path, cache_path)
+        except (OSError, TypeError, ValueError) as e:
+            # Read-only install or non-JSON types: fall back to YAML every time
+            logger.debug(f"Could not write config cache {cache_path}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        
+        for stale in glob.glob(f"{glob.escape(config_path)}.*.json"):
+            if stale != cache_path:
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+    
+    def _init_monitoring(self):
+        """Initialize components only needed by the monitoring loop"""
+        if self.analyzer is None:
+            from src.analyzer import WaterQualityAnalyzer
+            self.analyzer = WaterQualityAnalyzer(self.config['thresholds'])
     
     def signal_handler(self, signum, frame):
         """Handle shutdown signals"""
+        if self._wake.is_set():
+            return  # Already shutting down
+        if not self.running:
+            # Not monitoring (e.g. a CLI command); keep the default behaviour
+            if signum == signal.SIGINT:
+                raise KeyboardInterrupt
+            sys.exit(128 + signum)
         logger.info("Shutdown signal received")
         self.stop()
     
     def start(self):
         """Start the monitoring system"""
+        self._init_monitoring()
+        self._wake.clear()
         self.running = True
         logger.info("Starting water quality monitoring...")
         
-        # Register signal handlers
-        signal.signal(signal.SIGINT, self.signal_handler)
-        signal.signal(signal.SIGTERM, self.signal_handler)
+        measurement_interval = self.settings.measurement_interval
         
-        measurement_interval = self.config['system']['measurement_interval']
+        # Bind hot-loop callables to locals once; this loop runs forever
+        _now = datetime.now
+        _monotonic = time.monotonic
+        _info = logger.info
+        _wait = self._wake.wait
         consecutive_errors = 0
         max_consecutive_errors = 5
+        next_deadline = _monotonic()
         
         try:
             while self.running:
                 try:
+                    # One wall-clock timestamp shared by everything this cycle
+                    now = _now()
+                    
                     # Read sensor data
                     readings = self.sensor_manager.read_all()
                     
-                    if readings:
+                    if readings and all(readings.get(k) is not None for k in SENSOR_KEYS):
                         # Classify water quality
                         classification = self.classifier.classify(readings)
                         readings['quality_class'] = classification['class']
                         readings['quality_score'] = classification['score']
                         
-                        # Log readings
-                        logger.info(
-                            f"Readings: pH={readings.get('pH'):.2f}, "
-                            f"Turbidity={readings.get('turbidity'):.1f} NTU, "
-                            f"Temp={readings.get('temperature'):.1f}°C, "
-                            f"Quality={classification['class']}"
+                        # Log readings (formatted only if the record is emitted)
+                        _info(
+                            "Readings: pH=%.2f, Turbidity=%.1f NTU, Temp=%.1f°C, Quality=%s",
+                            readings['pH'], readings['turbidity'], readings['temperature'],
+                            classification['class']
                         )
                         
-                        # Store in database
+                        # Store in database (queued for the batch writer)
                         self.data_handler.save_reading(readings)
                         
                         # Analyze for pollution events
                         events = self.analyzer.analyze(readings)
                         
-                        # Handle any events
+                        # Events detected in one cycle share a single commit
                         if events:
-                            for event in events:
-                                logger.warning(f"Pollution Event: {event['description']}")
-                                
-                                # Create alert
-                                alert = {
-                                    'type': event['event_type'],
-                                    'severity': event['severity'],
-                                    'message': event['description'],
-                                    'timestamp': datetime.now(),
-                                    'pH': readings.get('pH'),
-                                    'turbidity': readings.get('turbidity'),
-                                    'temperature': readings.get('temperature')
-                                }
-                                
-                                self.alert_manager.send_alert(alert)
-                                self.data_handler.save_event(event)
+                            with self.data_handler.transaction() as tx:
+                                for event in events:
+                                    tx.save_event(event)
+                        
+                        # Handle any events
+                        for event in events:
+                            logger.warning(f"Pollution Event: {event['description']}")
+                            
+                            # Create alert
+                            alert = {
+                                'type': event['event_type'],
+                                'severity': event['severity'],
+                                'message': event['description'],
+                                'timestamp': now,
+                                'pH': readings.get('pH'),
+                                'turbidity': readings.get('turbidity'),
+                                'temperature': readings.get('temperature')
+                            }
+                            
+                            self.alert_manager.send_alert(alert)
                         
                         # Reset error counter
                         consecutive_errors = 0
@@ -150,18 +310,22 @@ class AquaSentinelMonitor:
                                 'type': 'system_error',
                                 'severity': 'critical',
                                 'message': 'Sensor communication failure',
-                                'timestamp': datetime.now()
+                                'timestamp': now
                             }
                             self.alert_manager.send_alert(error_alert)
                             consecutive_errors = 0
-                    
-                    # Wait for next measurement
-                    time.sleep(measurement_interval)
                 
                 except Exception as e:
                     logger.error(f"Error in monitoring loop: {e}", exc_info=True)
                     consecutive_errors += 1
-                    time.sleep(measurement_interval)
+                
+                # Wait for next measurement on a fixed schedule so sensor
+                # latency doesn't accumulate; stop() wakes us immediately
+                next_deadline += measurement_interval
+                mono_now = _monotonic()
+                if next_deadline < mono_now:
+                    next_deadline = mono_now  # Overran the interval, don't burst
+                _wait(next_deadline - mono_now)
         
         finally:
             self.cleanup()
@@ -170,16 +334,20 @@ class AquaSentinelMonitor:
         """Stop the monitoring system"""
         logger.info("Stopping monitoring system...")
         self.running = False
+        self._wake.set()
     
     def cleanup(self):
         """Cleanup resources"""
         logger.info("Cleaning up resources...")
         try:
             self.sensor_manager.cleanup()
+            self.alert_manager.close()
             self.data_handler.close()
             logger.info("Cleanup complete")
         except Exception as e:
             logger.error(f"Error during cleanup: {e}")
+        finally:
+            stop_log_listener()
     
     def get_status(self):
         """Get current system status"""
@@ -231,62 +399,85 @@ class AquaSentinelMonitor:
     def generate_report(self, days=7, output_file=None):
         """Generate water quality report"""
         try:
+            now = datetime.now()
             if not output_file:
-                timestamp = datetime.now().strftime('%Y%m%d')
+                timestamp = now.strftime('%Y%m%d')
                 output_file = f"data/report_{timestamp}.txt"
             
-            start_date = datetime.now() - timedelta(days=days)
+            # Truncated so reruns within the same minute share a cache entry
+            start_date = (now - timedelta(days=days)).replace(second=0, microsecond=0)
             
             # Get data
-            readings = self.data_handler.get_readings(start_date=start_date, limit=10000)
-            events = self.data_handler.get_events(start_date=start_date, limit=1000)
-            stats = self.data_handler.get_statistics(start_date=start_date)
+            stats, quality_counts, event_count, events = self._get_report_data(start_date)
             
             # Generate report
-            with open(output_file, 'w') as f:
-                f.write("=" * 60 + "\n")
-                f.write("AquaSentinel-Pi5 Water Quality Report\n")
-                f.write("=" * 60 + "\n\n")
-                f.write(f"Report Period: {days} days\n")
-                f.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-                
-                # Statistics
-                f.write("-" * 60 + "\n")
-                f.write("STATISTICS\n")
-                f.write("-" * 60 + "\n")
-                f.write(f"Total Readings: {stats.get('count', 0)}\n")
-                f.write(f"Average pH: {stats.get('avg_pH', 0):.2f}\n")
-                f.write(f"Average Turbidity: {stats.get('avg_turbidity', 0):.2f} NTU\n")
-                f.write(f"Average Temperature: {stats.get('avg_temperature', 0):.2f}°C\n\n")
-                
-                # Quality distribution
-                f.write("-" * 60 + "\n")
-                f.write("WATER QUALITY DISTRIBUTION\n")
-                f.write("-" * 60 + "\n")
-                quality_counts = self.data_handler.get_quality_distribution(start_date)
-                for quality, count in quality_counts.items():
-                    percentage = (count / stats.get('count', 1)) * 100
-                    f.write(f"{quality}: {count} ({percentage:.1f}%)\n")
-                f.write("\n")
-                
-                # Pollution events
-                f.write("-" * 60 + "\n")
-                f.write("POLLUTION EVENTS\n")
-                f.write("-" * 60 + "\n")
-                f.write(f"Total Events: {len(events)}\n\n")
-                for event in events[:10]:  # Show last 10 events
-                    f.write(f"[{event['timestamp']}] {event['event_type'].upper()}\n")
-                    f.write(f"  Severity: {event['severity']}\n")
-                    f.write(f"  Description: {event['description']}\n\n")
-                
-                f.write("=" * 60 + "\n")
+            total = stats.get('count') or 1
+            distribution = ''.join(
+                _REPORT_DIST_TMPL.format(quality=quality, count=count, percentage=count / total * 100)
+                for quality, count in quality_counts.items()
+            )
+            event_lines = ''.join(
+                _REPORT_EVENT_TMPL.format(
+                    timestamp=event['timestamp'],
+                    event_type=event['event_type'].upper(),
+                    severity=event['severity'],
+                    description=event['description']
+                )
+                for event in events  # Last 10 events
+            )
+            
+            rendered = _REPORT_TMPL.format_map({
+                'days': days,
+                'generated': now.strftime('%Y-%m-%d %H:%M:%S'),
+                'count': stats.get('count', 0),
+                'avg_pH': stats.get('avg_pH') or 0,
+                'avg_turbidity': stats.get('avg_turbidity') or 0,
+                'avg_temperature': stats.get('avg_temperature') or 0,
+                'distribution': distribution,
+                'event_count': event_count,
+                'events': event_lines
+            })
+            Path(output_file).write_bytes(rendered.encode('utf-8'))
             
             logger.info(f"Report generated: {output_file}")
             return output_file
-            
+        
         except Exception as e:
             logger.error(f"Failed to generate report: {e}")
             return None
+    
+    
+    def _get_report_data(self, start_date):
+        """
+        Get (stats, quality_counts, event_count, recent_events) for a report
+        
+        Aggregates are cached in memory keyed on the period start and the
+        reading/event id ranges, so rerunning a report over unchanged data
+        skips the table scans.
+        """
+        key = (start_date,) + self.data_handler.get_id_range()
+        
+        if key in self._report_cache:
+            return self._report_cache[key]
+        
+        events = self.data_handler.get_events(start_date=start_date, limit=1000)
+        data = (
+            self.data_handler.get_statistics(start_date=start_date),
+            self.data_handler.get_quality_distribution(start_date),
+            len(events),
+            events[:10]
+        )
+        
+        # Entries for older ids can never be hit again
+        self._report_cache = {k: v for k, v in self._report_cache.items() if k[1:] == key[1:]}
+        self._report_cache[key] = data
+        
+        return data
+
+
+def _format_reading(value, fmt):
+    """Format a sensor value, or 'N/A' if it is missing"""
+    return 'N/A' if value is None else fmt % value
 
 
 def main():
@@ -308,6 +499,7 @@ def main():
     parser.add_argument('--cleanup', action='store_true', help='Clean old data')
     parser.add_argument('--test', action='store_true', help='Test system')
     parser.add_argument('--web', action='store_true', help='Start web dashboard')
+    parser.add_argument('--host', default='0.0.0.0', help='Web bind address')
     parser.add_argument('--port', type=int, default=8080, help='Web port')
     parser.add_argument('--verbose', action='store_true', help='Verbose logging')
     parser.add_argument('--validate-config', action='store_true', help='Validate config')
@@ -334,9 +526,9 @@ def main():
         print(f"Status: {status['status']}")
         if 'current_readings' in status:
             r = status['current_readings']
-            print(f"pH: {r.get('pH', 'N/A'):.2f}")
-            print(f"Turbidity: {r.get('turbidity', 'N/A'):.1f} NTU")
-            print(f"Temperature: {r.get('temperature', 'N/A'):.1f}°C")
+            print("pH: %s" % _format_reading(r.get('pH'), '%.2f'))
+            print("Turbidity: %s NTU" % _format_reading(r.get('turbidity'), '%.1f'))
+            print("Temperature: %s°C" % _format_reading(r.get('temperature'), '%.1f'))
             print(f"Quality: {status['quality_class']} ({status['quality_score']}/100)")
         print(f"Timestamp: {status['timestamp']}")
         print("=" * 30 + "\n")
@@ -386,9 +578,10 @@ def main():
             print(f"Error: {status.get('message')}")
     
     elif args.web:
+        logger.info(f"Starting web dashboard on {args.host}:{args.port}")
+        from src.web_dashboard import create_app
         app = create_app(monitor)
-        logger.info(f"Starting web dashboard on port {args.port}")
-        app.run(host='0.0.0.0', port=args.port, debug=args.verbose)
+        app.run(host=args.host, port=args.port, debug=args.verbose)
     
     else:
         logger.info("=" * 60)
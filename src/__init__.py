@@ -6,11 +6,17 @@ Smart Water Quality Monitoring System
 __version__ = '1.0.0'
 __author__ = 'AquaSentinel Team'
 
-from .sensors import SensorManager
-from .analyzer import WaterQualityAnalyzer
-from .classifier import WaterQualityClassifier
-from .alerts import AlertManager
-from .data_handler import DataHandler
+import importlib
+
+# Submodules are imported on first attribute access so that
+# ``import src.sensors`` does not pull in every other subsystem
+_LAZY_EXPORTS = {
+    'SensorManager': '.sensors',
+    'WaterQualityAnalyzer': '.analyzer',
+    'WaterQualityClassifier': '.classifier',
+    'AlertManager': '.alerts',
+    'DataHandler': '.data_handler'
+}
 
 __all__ = [
     'SensorManager',
@@ -19,3 +25,16 @@ __all__ = [
     'AlertManager',
     'DataHandler'
 ]
+
+
+def __getattr__(name):
+    if name in _LAZY_EXPORTS:
+        module = importlib.import_module(_LAZY_EXPORTS[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY_EXPORTS))
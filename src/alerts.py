@@ -3,12 +3,12 @@ Alert Management Module
 Multi-channel notifications for water quality events
 """
 
+import time
 import logging
 import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 from typing import Dict
-from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +18,36 @@ try:
 except ImportError:
     HAS_TWILIO = False
 
+EMAIL_SUBJECT_TEMPLATE = "AquaSentinel Alert: {severity}"
+
+EMAIL_BODY_TEMPLATE = """
+AquaSentinel-Pi5 Water Quality Alert
+
+SEVERITY: {severity}
+TYPE: {type}
+TIME: {time}
+
+MESSAGE:
+{message}
+
+WATER PARAMETERS:
+- pH: {pH}
+- Turbidity: {turbidity} NTU
+- Temperature: {temperature}°C
+
+---
+AquaSentinel-Pi5 Monitoring System
+"""
+
+SMS_PREFIX = "🌊 AquaSentinel Alert\n"
+SMS_MAX_LENGTH = 160
+
+# Seconds send_alert() waits for all channels to finish
+ALERT_DISPATCH_TIMEOUT = 10
+
+# Default seconds before an identical (type, severity) alert is resent
+DEFAULT_DEDUPE_COOLDOWN = 300
+
 
 class EmailAlert:
     """Email notification handler"""
@@ -32,49 +62,101 @@ class EmailAlert:
             self.username = config.get('username')
             self.password = config.get('password')
             self.recipients = config.get('recipients', [])
+            
+            # Static parts of every message, rendered once. Messages are
+            # plain text, so headers are written directly (RFC 5322, CRLF)
+            self._headers = (
+                f"From: {self.username}\r\n"
+                f"To: {', '.join(self.recipients)}\r\n"
+                "MIME-Version: 1.0\r\n"
+                "Content-Type: text/plain; charset=utf-8\r\n"
+                "Content-Transfer-Encoding: 8bit\r\n"
+            )
+            self._subject_tmpl = EMAIL_SUBJECT_TEMPLATE.format_map
+            self._body_tmpl = EMAIL_BODY_TEMPLATE.replace('\n', '\r\n').format_map
+            
+            # SMTP session reused across alerts (see _get_connection)
+            self._smtp = None
+            self._lock = threading.Lock()
             logger.info("Email alerts enabled")
     
+    def _connect(self) -> smtplib.SMTP:
+        """Open and authenticate a new SMTP session"""
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port)
+        try:
+            server.starttls()
+            server.login(self.username, self.password)
+        except Exception:
+            server.close()
+            raise
+        return server
+    
+    def _get_connection(self) -> smtplib.SMTP:
+        """Return a live SMTP session, reconnecting if the old one dropped"""
+        if self._smtp is not None:
+            try:
+                self._smtp.noop()
+                return self._smtp
+            except smtplib.SMTPException:
+                self._discard_connection()
+        
+        self._smtp = self._connect()
+        return self._smtp
+    
+    def _discard_connection(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.close()
+            except Exception:
+                pass
+            self._smtp = None
+    
     def send(self, alert: Dict) -> bool:
         if not self.enabled:
             return False
         
         try:
-            msg = MIMEMultipart()
-            msg['Subject'] = f"AquaSentinel Alert: {alert['severity'].upper()}"
-            msg['From'] = self.username
-            msg['To'] = ', '.join(self.recipients)
+            severity = alert['severity'].upper()
+            subject = self._subject_tmpl({'severity': severity})
             
-            body = f"""
-AquaSentinel-Pi5 Water Quality Alert
-
-SEVERITY: {alert['severity'].upper()}
-TYPE: {alert['type']}
-TIME: {alert['timestamp'].strftime('%Y-%m-%d %H:%M:%S')}
-
-MESSAGE:
-{alert['message']}
-
-WATER PARAMETERS:
-- pH: {alert.get('pH', 'N/A')}
-- Turbidity: {alert.get('turbidity', 'N/A')} NTU
-- Temperature: {alert.get('temperature', 'N/A')}°C
-
----
-AquaSentinel-Pi5 Monitoring System
-"""
+            body = self._body_tmpl({
+                'severity': severity,
+                'type': alert['type'],
+                'time': alert['timestamp'].isoformat(sep=' ', timespec='seconds'),
+                'message': alert['message'],
+                'pH': alert.get('pH', 'N/A'),
+                'turbidity': alert.get('turbidity', 'N/A'),
+                'temperature': alert.get('temperature', 'N/A')
+            })
             
-            msg.attach(MIMEText(body, 'plain'))
+            raw = f"{self._headers}Subject: {subject}\r\n\r\n{body}".encode('utf-8')
             
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.username, self.password)
-                server.send_message(msg)
+            with self._lock:
+                try:
+                    self._get_connection().sendmail(self.username, self.recipients, raw)
+                except smtplib.SMTPServerDisconnected:
+                    # Server dropped us between NOOP and send; retry once
+                    self._discard_connection()
+                    self._get_connection().sendmail(self.username, self.recipients, raw)
             
             logger.info("Email alert sent")
             return True
         except Exception as e:
             logger.error(f"Failed to send email: {e}")
             return False
+    
+    def close(self):
+        """Close the cached SMTP session"""
+        if not self.enabled:
+            return
+        
+        with self._lock:
+            if self._smtp is not None:
+                try:
+                    self._smtp.quit()
+                except Exception:
+                    pass
+                self._smtp = None
 
 
 class SMSAlert:
@@ -98,11 +180,11 @@ class SMSAlert:
             return False
         
         try:
-            message = f"🌊 AquaSentinel Alert\n{alert['severity'].upper()}: {alert['message']}"
+            body = f"{SMS_PREFIX}{alert['severity'].upper()}: {alert['message']}"[:SMS_MAX_LENGTH]
             
             for number in self.to_numbers:
                 self.client.messages.create(
-                    body=message[:160],
+                    body=body,
                     from_=self.from_number,
                     to=number
                 )
@@ -117,6 +199,14 @@ class SMSAlert:
 class LocalAlert:
     """Local buzzer and LED alerts"""
     
+    # severity -> (LED color, beep duration, beep count)
+    _LUT = {
+        'critical': ('red', 0.5, 3),
+        'warning': ('yellow', 0.2, 2),
+        'info': ('blue', 0.1, 1)
+    }
+    _DEFAULT = ('white', 0.1, 1)
+    
     def __init__(self, config: Dict, indicators=None):
         self.config = config
         self.buzzer_enabled = config.get('buzzer_enabled', True)
@@ -128,23 +218,12 @@ class LocalAlert:
             return False
         
         try:
-            severity = alert['severity']
+            color, duration, count = self._LUT.get(alert['severity'], self._DEFAULT)
             
             if self.led_enabled:
-                colors = {
-                    'critical': 'red',
-                    'warning': 'yellow',
-                    'info': 'blue'
-                }
-                self.indicators.set_led(colors.get(severity, 'white'))
+                self.indicators.set_led(color)
             
             if self.buzzer_enabled:
-                patterns = {
-                    'critical': (0.5, 3),
-                    'warning': (0.2, 2),
-                    'info': (0.1, 1)
-                }
-                duration, count = patterns.get(severity, (0.1, 1))
                 self.indicators.beep(duration=duration, count=count)
             
             return True
@@ -160,19 +239,43 @@ class AlertManager:
         self.email_alert = EmailAlert(config.get('email', {}))
         self.sms_alert = SMSAlert(config.get('sms', {}))
         self.local_alert = LocalAlert(config.get('local', {}), indicators)
+        
+        # Channels notified for each severity; unknown severities go local
+        self._routes = {
+            'critical': (self.email_alert.send, self.sms_alert.send, self.local_alert.send),
+            'warning': (self.email_alert.send, self.local_alert.send),
+            'info': (self.local_alert.send,)
+        }
+        
+        # Channels are network/GPIO bound, so dispatch them concurrently
+        self._pool = ThreadPoolExecutor(max_workers=3, thread_name_prefix='alert')
+        
+        # Suppress repeats of the same alert during a sustained incident
+        self.dedupe_cooldown = config.get('dedupe_cooldown', DEFAULT_DEDUPE_COOLDOWN)
+        self._last_sent = {}
         logger.info("Alert manager initialized")
     
+    def close(self):
+        """Release resources held by alert channels"""
+        self._pool.shutdown(wait=False)
+        self.email_alert.close()
+    
     def send_alert(self, alert: Dict):
+        key = (alert['type'], alert['severity'])
+        now = time.monotonic()
+        last = self._last_sent.get(key)
+        if last is not None and now - last < self.dedupe_cooldown:
+            logger.debug("Suppressing duplicate alert: %s (%s)", alert['type'], alert['severity'])
+            return
+        self._last_sent[key] = now
+        
         logger.info(f"Sending alert: {alert['type']} ({alert['severity']})")
         
-        severity = alert['severity']
+        futures = [
+            self._pool.submit(send, alert)
+            for send in self._routes.get(alert['severity'], self._routes['info'])
+        ]
         
-        if severity == 'critical':
-            self.email_alert.send(alert)
-            self.sms_alert.send(alert)
-            self.local_alert.send(alert)
-        elif severity == 'warning':
-            self.email_alert.send(alert)
-            self.local_alert.send(alert)
-        else:
-            self.local_alert.send(alert)
+        _, pending = wait(futures, timeout=ALERT_DISPATCH_TIMEOUT)
+        if pending:
+            logger.warning(f"{len(pending)} alert channel(s) still sending after {ALERT_DISPATCH_TIMEOUT}s")
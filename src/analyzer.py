@@ -4,12 +4,328 @@ Detects pollution events and analyzes trends
 """
 
 import logging
-from typing import Dict, List
+import math
+import time
+from numbers import Real
+from typing import Dict, List, NamedTuple, Tuple
 from datetime import datetime
-from collections import deque
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        """Stand-in for numba.njit: run the decorated function as plain Python"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
 
 logger = logging.getLogger(__name__)
 
+# Readings kept for trend analysis (10 minutes at 10 s intervals)
+HISTORY_SIZE = 60
+
+# History element type. float32 would save 240 bytes per buffer but rounds
+# readings like 7.3, which can move window ranges across the event limits
+# and make analyze disagree with the float64 analyze_batch path
+HISTORY_DTYPE = np.float64
+
+# Windowed check parameters, shared by analyze and analyze_batch
+CHANGE_WINDOW = 6              # Rapid change / spike window (1 minute)
+TREND_WINDOW = 30              # Trend window (5 minutes)
+PH_CHANGE_LIMIT = 0.5          # pH units within CHANGE_WINDOW
+TURBIDITY_SPIKE_PERCENT = 50   # % over the previous readings' average
+TEMPERATURE_CHANGE_LIMIT = 5   # °C within CHANGE_WINDOW
+SUSTAINED_PH_RANGE = (6.5, 8.5)
+SUSTAINED_PH_COUNT = 20        # Readings outside the range, out of TREND_WINDOW
+TURBIDITY_TREND_RATIO = 1.5    # Second half vs first half of TREND_WINDOW
+
+# Event bits returned by _detect_events_numeric, in reporting order
+EVT_PH_CRITICAL_LOW = 0
+EVT_PH_CRITICAL_HIGH = 1
+EVT_PH_LOW = 2
+EVT_PH_HIGH = 3
+EVT_PH_RAPID_CHANGE = 4
+EVT_TURBIDITY_CRITICAL = 5
+EVT_TURBIDITY_HIGH = 6
+EVT_TURBIDITY_SPIKE = 7
+EVT_TEMPERATURE_EXTREME = 8
+EVT_TEMPERATURE_RAPID_CHANGE = 9
+EVT_MULTI_PARAMETER = 10
+EVT_SUSTAINED_POOR_PH = 11
+EVT_INCREASING_TURBIDITY = 12
+
+
+class _EventSpec(NamedTuple):
+    """Static description of the event reported for one kernel bit"""
+    event_type: str
+    severity: str
+    template: str
+    with_readings: bool
+
+
+# Event spec per kernel bit
+_EVENT_SPECS = tuple(_EventSpec(*spec) for spec in (
+    ('pH_critical_low', 'critical',
+     'Critical acidic pH detected: {pH:.2f} (Possible industrial discharge)', True),
+    ('pH_critical_high', 'critical',
+     'Critical alkaline pH detected: {pH:.2f} (Possible chemical spill)', True),
+    ('pH_low', 'warning', 'Acidic pH detected: {pH:.2f}', True),
+    ('pH_high', 'warning', 'Alkaline pH detected: {pH:.2f}', True),
+    ('pH_rapid_change', 'warning',
+     'Rapid pH change detected: {pH_change:.2f} units in 1 minute', True),
+    ('turbidity_critical', 'critical',
+     'Critical turbidity level: {turbidity:.1f} NTU (Possible sediment spill or algae bloom)', True),
+    ('turbidity_high', 'warning', 'High turbidity detected: {turbidity:.1f} NTU', True),
+    ('turbidity_spike', 'warning',
+     'Turbidity spike detected: {increase_percent:.0f}% increase', True),
+    ('temperature_extreme', 'critical',
+     'Extreme water temperature: {temperature:.1f}°C', True),
+    ('temperature_rapid_change', 'warning',
+     'Rapid temperature change: {temp_change:.1f}°C in 1 minute (Possible thermal pollution)', True),
+    ('multi_parameter_degradation', 'critical',
+     'Multiple parameters degraded: pH={pH:.2f}, Turbidity={turbidity:.1f}NTU, Temp={temperature:.1f}°C', True),
+    ('sustained_poor_pH', 'warning',
+     'pH outside acceptable range for extended period', False),
+    ('increasing_turbidity_trend', 'info',
+     'Turbidity showing increasing trend', False),
+))
+
+# Reading indexes used by threshold rules
+METRIC_PH = 0
+METRIC_TURBIDITY = 1
+METRIC_TEMPERATURE = 2
+
+
+class _ThresholdRule(NamedTuple):
+    """A reading band that fires an event bit when the reading falls inside it"""
+    metric: int
+    low: float
+    low_closed: bool
+    high: float
+    high_closed: bool
+    bit: int
+
+
+# Single-reading threshold checks. Bands for one metric are disjoint, which
+# keeps the critical-before-warning precedence of the original checks.
+THRESHOLD_RULES = (
+    _ThresholdRule(METRIC_PH, -math.inf, True, 5.0, False, EVT_PH_CRITICAL_LOW),
+    _ThresholdRule(METRIC_PH, 10.0, False, math.inf, True, EVT_PH_CRITICAL_HIGH),
+    _ThresholdRule(METRIC_PH, 5.0, True, 5.5, False, EVT_PH_LOW),
+    _ThresholdRule(METRIC_PH, 9.5, False, 10.0, True, EVT_PH_HIGH),
+    _ThresholdRule(METRIC_TURBIDITY, 100.0, False, math.inf, True, EVT_TURBIDITY_CRITICAL),
+    _ThresholdRule(METRIC_TURBIDITY, 25.0, False, 100.0, True, EVT_TURBIDITY_HIGH),
+    _ThresholdRule(METRIC_TEMPERATURE, -math.inf, True, 0.0, False, EVT_TEMPERATURE_EXTREME),
+    _ThresholdRule(METRIC_TEMPERATURE, 40.0, False, math.inf, True, EVT_TEMPERATURE_EXTREME),
+)
+
+# THRESHOLD_RULES as parallel arrays (metric, low, low_closed, high,
+# high_closed, bit) for the compiled _check_bands
+_RULE_ARRAYS = tuple(
+    np.array(column, dtype=dtype)
+    for column, dtype in zip(zip(*THRESHOLD_RULES),
+                             (np.int64, np.float64, np.bool_, np.float64, np.bool_, np.int64))
+)
+
+
+class _RingBuffer:
+    """Fixed-size history of floats backed by a preallocated NumPy array"""
+    
+    __slots__ = ('buf', 'idx', 'count', 'total')
+    
+    def __init__(self, size: int):
+        self.buf = np.full(size, np.nan, dtype=HISTORY_DTYPE)
+        self.idx = 0      # Next write position
+        self.count = 0    # Number of valid values (<= size)
+        self.total = 0.0  # Running sum of the valid values
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    def append(self, value):
+        value = np.nan if value is None else float(value)
+        size = self.buf.shape[0]
+        if self.count == size:
+            self.total -= float(self.buf[self.idx])
+        else:
+            self.count += 1
+        self.buf[self.idx] = value
+        self.total += value
+        self.idx = (self.idx + 1) % size
+        if self.idx == 0:
+            # Resync once per lap so add/subtract rounding cannot accumulate
+            self.total = float(self.buf[:self.count].sum())
+    
+    def mean(self) -> float:
+        return self.total / self.count
+    
+    def tail(self, n: int) -> np.ndarray:
+        """
+        Get the last n values, oldest first
+        
+        Returns a view into the buffer unless the window wraps around.
+        """
+        start = self.idx - n
+        if start >= 0:
+            return self.buf[start:self.idx]
+        return np.concatenate((self.buf[start:], self.buf[:self.idx]))
+    
+    def values(self) -> np.ndarray:
+        return self.tail(self.count)
+
+
+@njit(cache=True)
+def _window_stats(buf, end, n):
+    """Min, max and sum of the n ring buffer values ending before index end"""
+    size = buf.shape[0]
+    lo = math.inf
+    hi = -math.inf
+    total = 0.0
+    for i in range(end - n, end):
+        value = buf[i % size]
+        if value < lo:
+            lo = value
+        if value > hi:
+            hi = value
+        total += value
+    return lo, hi, total
+
+
+@njit(cache=True)
+def _count_outside(buf, end, n, low, high):
+    """Count ring buffer values outside [low, high] among the last n"""
+    size = buf.shape[0]
+    count = 0
+    for i in range(end - n, end):
+        value = buf[i % size]
+        if value < low or value > high:
+            count += 1
+    return count
+
+
+@njit(cache=True)
+def _check_bands(pH, turbidity, temperature, metric, low, low_closed, high, high_closed, bit):
+    """Event bitmask of the threshold rules a reading falls inside (NaN matches none)"""
+    mask = 0
+    for i in range(metric.shape[0]):
+        if metric[i] == METRIC_PH:
+            value = pH
+        elif metric[i] == METRIC_TURBIDITY:
+            value = turbidity
+        else:
+            value = temperature
+        above = value >= low[i] if low_closed[i] else value > low[i]
+        below = value <= high[i] if high_closed[i] else value < high[i]
+        if above and below:
+            mask |= 1 << bit[i]
+    return mask
+
+
+@njit(cache=True)
+def _detect_events_numeric(pH, turbidity, temperature,
+                           pH_buf, pH_idx, pH_count,
+                           turb_buf, turb_idx, turb_count,
+                           temp_buf, temp_idx, temp_count):
+    """
+    Run the windowed and multi-parameter checks on one reading
+    
+    Single-reading threshold bands are checked by _check_bands.
+    Missing readings are passed as NaN.
+    
+    Returns:
+        Tuple of (event bitmask, pH change, turbidity increase %, temperature change)
+    """
+    mask = 0
+    pH_change = 0.0
+    increase_percent = 0.0
+    temp_change = 0.0
+    has_pH = not math.isnan(pH)
+    has_turbidity = not math.isnan(turbidity)
+    has_temperature = not math.isnan(temperature)
+    
+    if has_pH:
+        # Rapid pH change over the last minute of data (10s intervals)
+        if pH_count >= CHANGE_WINDOW:
+            lo, hi, _ = _window_stats(pH_buf, pH_idx, CHANGE_WINDOW)
+            pH_change = hi - lo
+            if pH_change > PH_CHANGE_LIMIT:
+                mask |= 1 << EVT_PH_RAPID_CHANGE
+    
+    if has_turbidity:
+        # Spike against the average of the readings before this one
+        if turb_count >= CHANGE_WINDOW:
+            _, _, total = _window_stats(turb_buf, turb_idx - 1, CHANGE_WINDOW - 1)
+            previous_avg = total / (CHANGE_WINDOW - 1)
+            if previous_avg > 0:
+                increase_percent = ((turbidity - previous_avg) / previous_avg) * 100
+                if increase_percent > TURBIDITY_SPIKE_PERCENT:
+                    mask |= 1 << EVT_TURBIDITY_SPIKE
+    
+    if has_temperature:
+        if temp_count >= CHANGE_WINDOW:
+            lo, hi, _ = _window_stats(temp_buf, temp_idx, CHANGE_WINDOW)
+            temp_change = hi - lo
+            if temp_change > TEMPERATURE_CHANGE_LIMIT:
+                mask |= 1 << EVT_TEMPERATURE_RAPID_CHANGE
+    
+    if has_pH and has_turbidity and has_temperature:
+        poor_conditions = 0
+        if pH < 6.0 or pH > 9.0:
+            poor_conditions += 1
+        if turbidity > 25:
+            poor_conditions += 1
+        if temperature < 10 or temperature > 30:
+            poor_conditions += 1
+        if poor_conditions >= 2:
+            mask |= 1 << EVT_MULTI_PARAMETER
+    
+    # Sustained poor pH: most of the last 5 minutes outside 6.5-8.5
+    if pH_count >= TREND_WINDOW:
+        low, high = SUSTAINED_PH_RANGE
+        if _count_outside(pH_buf, pH_idx, TREND_WINDOW, low, high) > SUSTAINED_PH_COUNT:
+            mask |= 1 << EVT_SUSTAINED_POOR_PH
+    
+    # Turbidity trend: second half of the last 30 readings vs the first
+    if turb_count >= TREND_WINDOW:
+        half = TREND_WINDOW // 2
+        _, _, first_total = _window_stats(turb_buf, turb_idx - half, half)
+        _, _, second_total = _window_stats(turb_buf, turb_idx, half)
+        if second_total / half > (first_total / half) * TURBIDITY_TREND_RATIO:
+            mask |= 1 << EVT_INCREASING_TURBIDITY
+    
+    return mask, pH_change, increase_percent, temp_change
+
+
+def _sequential_sum(windows: np.ndarray, start: int, stop: int) -> np.ndarray:
+    """Row sums of windows[:, start:stop], added left to right like the kernel"""
+    total = windows[:, start].copy()
+    for column in range(start + 1, stop):
+        total += windows[:, column]
+    return total
+
+
+def _per_step(window_values: np.ndarray, ends: np.ndarray, size: int, valid: np.ndarray):
+    """
+    Spread per-window results back onto reading steps
+    
+    Args:
+        window_values: One value per window of the compacted history
+        ends: History length after each step
+        size: Window size
+        valid: Steps where the check applies
+    
+    Returns:
+        Tuple of (steps with a full window, value per step or 0.0)
+    """
+    starts = ends - size
+    valid = valid & (starts >= 0)
+    out = np.zeros(ends.shape[0], dtype=window_values.dtype)
+    out[valid] = window_values[starts[valid]]
+    return valid, out
+
 
 class WaterQualityAnalyzer:
     """Analyzes water quality trends and detects pollution events"""
@@ -24,12 +340,12 @@ class WaterQualityAnalyzer:
         self.thresholds = thresholds
         
         # Historical data for trend analysis (last 60 readings)
-        self.pH_history = deque(maxlen=60)
-        self.turbidity_history = deque(maxlen=60)
-        self.temperature_history = deque(maxlen=60)
+        self.pH_history = _RingBuffer(HISTORY_SIZE)
+        self.turbidity_history = _RingBuffer(HISTORY_SIZE)
+        self.temperature_history = _RingBuffer(HISTORY_SIZE)
         
-        # Event cooldown tracking
-        self.last_event_time = {}
+        # Event cooldown tracking: monotonic seconds per (event_type, severity)
+        self.last_event_time: Dict[Tuple[str, str], float] = {}
         self.event_cooldown = 300  # 5 minutes
         
         logger.info("Water quality analyzer initialized")
@@ -40,290 +356,219 @@ class WaterQualityAnalyzer:
         
         Args:
             readings: Dictionary with pH, turbidity, temperature
-            
+        
         Returns:
             List of pollution event dictionaries
         """
-        events = []
+        pH = readings.get('pH')
+        turbidity = readings.get('turbidity')
+        temperature = readings.get('temperature')
         
-        try:
-            # Update history
-            if 'pH' in readings:
-                self.pH_history.append(readings['pH'])
-            if 'turbidity' in readings:
-                self.turbidity_history.append(readings['turbidity'])
-            if 'temperature' in readings:
-                self.temperature_history.append(readings['temperature'])
-            
-            # Check for various pollution events
-            events.extend(self._check_pH_events(readings))
-            events.extend(self._check_turbidity_events(readings))
-            events.extend(self._check_temperature_events(readings))
-            events.extend(self._check_combined_events(readings))
-            events.extend(self._check_trend_events())
-            
-            # Apply cooldown filter
-            events = self._apply_cooldown(events)
-            
-            return events
-            
-        except Exception as e:
-            logger.error(f"Error analyzing water quality: {e}")
+        # Reject malformed input up front; everything below is arithmetic
+        for value in (pH, turbidity, temperature):
+            if value is not None and not isinstance(value, Real):
+                logger.error("Non-numeric reading passed to analyzer: %r", value)
+                return []
+        
+        pH_value = math.nan if pH is None else float(pH)
+        turbidity_value = math.nan if turbidity is None else float(turbidity)
+        temperature_value = math.nan if temperature is None else float(temperature)
+        
+        # Update history
+        pH_hist = self.pH_history
+        turb_hist = self.turbidity_history
+        temp_hist = self.temperature_history
+        if pH is not None:
+            pH_hist.append(pH_value)
+        if turbidity is not None:
+            turb_hist.append(turbidity_value)
+        if temperature is not None:
+            temp_hist.append(temperature_value)
+        
+        band_mask = _check_bands(pH_value, turbidity_value, temperature_value, *_RULE_ARRAYS)
+        mask, pH_change, increase_percent, temp_change = _detect_events_numeric(
+            pH_value, turbidity_value, temperature_value,
+            pH_hist.buf, pH_hist.idx, pH_hist.count,
+            turb_hist.buf, turb_hist.idx, turb_hist.count,
+            temp_hist.buf, temp_hist.idx, temp_hist.count
+        )
+        
+        mask |= band_mask
+        if not mask:
             return []
-    
-    def _check_pH_events(self, readings: Dict) -> List[Dict]:
-        """Check for pH-related pollution events"""
-        events = []
         
-        if 'pH' not in readings:
-            return events
-        
-        pH = readings['pH']
-        
-        # Critical pH levels
-        if pH < 5.0:
-            events.append({
-                'event_type': 'pH_critical_low',
-                'severity': 'critical',
-                'description': f'Critical acidic pH detected: {pH:.2f} (Possible industrial discharge)',
-                'pH': pH,
-                'turbidity': readings.get('turbidity'),
-                'temperature': readings.get('temperature'),
-                'timestamp': datetime.now()
-            })
-        
-        elif pH > 10.0:
-            events.append({
-                'event_type': 'pH_critical_high',
-                'severity': 'critical',
-                'description': f'Critical alkaline pH detected: {pH:.2f} (Possible chemical spill)',
-                'pH': pH,
-                'turbidity': readings.get('turbidity'),
-                'temperature': readings.get('temperature'),
-                'timestamp': datetime.now()
-            })
-        
-        # Poor pH levels
-        elif pH < 5.5:
-            events.append({
-                'event_type': 'pH_low',
-                'severity': 'warning',
-                'description': f'Acidic pH detected: {pH:.2f}',
-                'pH': pH,
-                'turbidity': readings.get('turbidity'),
-                'temperature': readings.get('temperature'),
-                'timestamp': datetime.now()
-            })
-        
-        elif pH > 9.5:
-            events.append({
-                'event_type': 'pH_high',
-                'severity': 'warning',
-                'description': f'Alkaline pH detected: {pH:.2f}',
-                'pH': pH,
-                'turbidity': readings.get('turbidity'),
-                'temperature': readings.get('temperature'),
-                'timestamp': datetime.now()
-            })
-        
-        # Rapid pH change
-        if len(self.pH_history) >= 6:  # Last minute of data (10s intervals)
-            recent_pH = list(self.pH_history)[-6:]
-            pH_change = max(recent_pH) - min(recent_pH)
-            
-            if pH_change > 0.5:
-                events.append({
-                    'event_type': 'pH_rapid_change',
-                    'severity': 'warning',
-                    'description': f'Rapid pH change detected: {pH_change:.2f} units in 1 minute',
-                    'pH': pH,
-                    'turbidity': readings.get('turbidity'),
-                    'temperature': readings.get('temperature'),
-                    'timestamp': datetime.now()
-                })
+        # Cooldown works on the static specs, so descriptions are only
+        # formatted for events that will actually be reported
+        fired = [spec for bit, spec in enumerate(_EVENT_SPECS) if mask & (1 << bit)]
+        survivors = self._apply_cooldown(fired, time.monotonic())
+        if not survivors:
+            return []
         
-        return events
-    
-    def _check_turbidity_events(self, readings: Dict) -> List[Dict]:
-        """Check for turbidity-related pollution events"""
+        values = {
+            'pH': pH,
+            'turbidity': turbidity,
+            'temperature': temperature,
+            'pH_change': pH_change,
+            'increase_percent': increase_percent,
+            'temp_change': temp_change
+        }
+        now = datetime.now()
         events = []
-        
-        if 'turbidity' not in readings:
-            return events
-        
-        turbidity = readings['turbidity']
-        
-        # Critical turbidity
-        if turbidity > 100:
-            events.append({
-                'event_type': 'turbidity_critical',
-                'severity': 'critical',
-                'description': f'Critical turbidity level: {turbidity:.1f} NTU (Possible sediment spill or algae bloom)',
-                'pH': readings.get('pH'),
-                'turbidity': turbidity,
-                'temperature': readings.get('temperature'),
-                'timestamp': datetime.now()
-            })
-        
-        # High turbidity
-        elif turbidity > 25:
-            events.append({
-                'event_type': 'turbidity_high',
-                'severity': 'warning',
-                'description': f'High turbidity detected: {turbidity:.1f} NTU',
-                'pH': readings.get('pH'),
-                'turbidity': turbidity,
-                'temperature': readings.get('temperature'),
-                'timestamp': datetime.now()
-            })
-        
-        # Turbidity spike
-        if len(self.turbidity_history) >= 6:
-            recent_turbidity = list(self.turbidity_history)[-6:]
-            previous_avg = sum(recent_turbidity[:-1]) / 5
-            
-            if previous_avg > 0:
-                increase_percent = ((turbidity - previous_avg) / previous_avg) * 100
-                
-                if increase_percent > 50:
-                    events.append({
-                        'event_type': 'turbidity_spike',
-                        'severity': 'warning',
-                        'description': f'Turbidity spike detected: {increase_percent:.0f}% increase',
-                        'pH': readings.get('pH'),
-                        'turbidity': turbidity,
-                        'temperature': readings.get('temperature'),
-                        'timestamp': datetime.now()
-                    })
+        for spec in survivors:
+            event = {
+                'event_type': spec.event_type,
+                'severity': spec.severity,
+                'description': spec.template.format_map(values)
+            }
+            if spec.with_readings:
+                event['pH'] = pH
+                event['turbidity'] = turbidity
+                event['temperature'] = temperature
+            event['timestamp'] = now
+            events.append(event)
         
         return events
     
-    def _check_temperature_events(self, readings: Dict) -> List[Dict]:
-        """Check for temperature-related pollution events"""
-        events = []
-        
-        if 'temperature' not in readings:
-            return events
-        
-        temperature = readings['temperature']
-        
-        # Extreme temperatures
-        if temperature < 0 or temperature > 40:
-            events.append({
-                'event_type': 'temperature_extreme',
-                'severity': 'critical',
-                'description': f'Extreme water temperature: {temperature:.1f}°C',
-                'pH': readings.get('pH'),
-                'turbidity': readings.get('turbidity'),
-                'temperature': temperature,
-                'timestamp': datetime.now()
-            })
-        
-        # Rapid temperature change
-        if len(self.temperature_history) >= 6:
-            recent_temp = list(self.temperature_history)[-6:]
-            temp_change = abs(max(recent_temp) - min(recent_temp))
-            
-            if temp_change > 5:
-                events.append({
-                    'event_type': 'temperature_rapid_change',
-                    'severity': 'warning',
-                    'description': f'Rapid temperature change: {temp_change:.1f}°C in 1 minute (Possible thermal pollution)',
-                    'pH': readings.get('pH'),
-                    'turbidity': readings.get('turbidity'),
-                    'temperature': temperature,
-                    'timestamp': datetime.now()
-                })
+    def analyze_batch(self, readings) -> List[Dict]:
+        """
+        Analyze a series of readings in one vectorized pass
         
-        return events
-    
-    def _check_combined_events(self, readings: Dict) -> List[Dict]:
-        """Check for multi-parameter pollution events"""
-        events = []
+        Reports the events a fresh analyzer would raise if the readings
+        were fed through analyze() one at a time, without the cooldown
+        (which is wall-clock based and meaningless for replayed data).
+        The analyzer's own history is neither used nor changed.
         
-        pH = readings.get('pH')
-        turbidity = readings.get('turbidity')
-        temperature = readings.get('temperature')
+        Args:
+            readings: Mapping or DataFrame of equal-length pH, turbidity and
+                temperature columns (NaN marks a missing reading), plus an
+                optional timestamp column copied onto the events
         
-        if pH is None or turbidity is None or temperature is None:
-            return events
+        Returns:
+            List of pollution event dictionaries in reading order
+        """
+        columns = [
+            np.asarray(readings[key], dtype=np.float64) if key in readings else None
+            for key in ('pH', 'turbidity', 'temperature')
+        ]
+        size = next((len(c) for c in columns if c is not None), 0)
+        pH, turbidity, temperature = series = [
+            np.full(size, np.nan) if c is None else c for c in columns
+        ]
+        # Positional like the value columns; a DataFrame's index is ignored
+        timestamps = (np.asarray(readings['timestamp'], dtype=object)
+                      if 'timestamp' in readings else None)
+        
+        fired = np.zeros((size, len(_EVENT_SPECS)), dtype=bool)
+        
+        # Threshold bands straight from the rule table (NaN fails every compare)
+        for rule in THRESHOLD_RULES:
+            values = series[rule.metric]
+            above = values >= rule.low if rule.low_closed else values > rule.low
+            below = values <= rule.high if rule.high_closed else values < rule.high
+            fired[:, rule.bit] |= above & below
+        
+        # Each history only holds the readings that were present, so windows
+        # are taken over the compacted series and mapped back to steps
+        present = [~np.isnan(values) for values in series]
+        compact = [values[mask] for values, mask in zip(series, present)]
+        ends = [np.cumsum(mask) for mask in present]
+        
+        def windows(index, width):
+            if len(compact[index]) < width:
+                return np.empty((0, width))
+            return sliding_window_view(compact[index], width)
+        
+        # Rapid pH / temperature change: range of the last CHANGE_WINDOW values
+        change = {}
+        for index, bit, limit in ((METRIC_PH, EVT_PH_RAPID_CHANGE, PH_CHANGE_LIMIT),
+                                  (METRIC_TEMPERATURE, EVT_TEMPERATURE_RAPID_CHANGE,
+                                   TEMPERATURE_CHANGE_LIMIT)):
+            w = windows(index, CHANGE_WINDOW)
+            valid, change[index] = _per_step(np.ptp(w, axis=1), ends[index],
+                                             CHANGE_WINDOW, present[index])
+            fired[:, bit] = valid & (change[index] > limit)
+        
+        # Turbidity spike against the average of the preceding readings
+        w = windows(METRIC_TURBIDITY, CHANGE_WINDOW)
+        valid, previous_avg = _per_step(
+            _sequential_sum(w, 0, CHANGE_WINDOW - 1) / (CHANGE_WINDOW - 1),
+            ends[METRIC_TURBIDITY], CHANGE_WINDOW, present[METRIC_TURBIDITY]
+        )
+        valid &= previous_avg > 0
+        increase_percent = np.zeros(size)
+        increase_percent[valid] = ((turbidity[valid] - previous_avg[valid]) / previous_avg[valid]) * 100
+        fired[:, EVT_TURBIDITY_SPIKE] = valid & (increase_percent > TURBIDITY_SPIKE_PERCENT)
         
         # Combined poor conditions
-        poor_conditions = 0
-        
-        if pH < 6.0 or pH > 9.0:
-            poor_conditions += 1
-        if turbidity > 25:
-            poor_conditions += 1
-        if temperature < 10 or temperature > 30:
-            poor_conditions += 1
-        
-        if poor_conditions >= 2:
-            events.append({
-                'event_type': 'multi_parameter_degradation',
-                'severity': 'critical',
-                'description': f'Multiple parameters degraded: pH={pH:.2f}, Turbidity={turbidity:.1f}NTU, Temp={temperature:.1f}°C',
-                'pH': pH,
-                'turbidity': turbidity,
-                'temperature': temperature,
-                'timestamp': datetime.now()
-            })
-        
-        return events
-    
-    def _check_trend_events(self) -> List[Dict]:
-        """Check for concerning trends"""
+        poor_conditions = (((pH < 6.0) | (pH > 9.0)).astype(np.int8) +
+                           (turbidity > 25) +
+                           ((temperature < 10) | (temperature > 30)))
+        fired[:, EVT_MULTI_PARAMETER] = present[0] & present[1] & present[2] & (poor_conditions >= 2)
+        
+        # Trends are checked on every step once the history is long enough
+        low, high = SUSTAINED_PH_RANGE
+        w = windows(METRIC_PH, TREND_WINDOW)
+        outside = np.count_nonzero((w < low) | (w > high), axis=1)
+        valid, outside = _per_step(outside, ends[METRIC_PH], TREND_WINDOW, np.ones(size, dtype=bool))
+        fired[:, EVT_SUSTAINED_POOR_PH] = valid & (outside > SUSTAINED_PH_COUNT)
+        
+        half = TREND_WINDOW // 2
+        w = windows(METRIC_TURBIDITY, TREND_WINDOW)
+        rising = (_sequential_sum(w, half, TREND_WINDOW) / half >
+                  (_sequential_sum(w, 0, half) / half) * TURBIDITY_TREND_RATIO)
+        valid, rising = _per_step(rising, ends[METRIC_TURBIDITY], TREND_WINDOW, np.ones(size, dtype=bool))
+        fired[:, EVT_INCREASING_TURBIDITY] = valid & rising
+        
+        # Materialize events only where a bit fired
         events = []
-        
-        # Check for sustained poor quality
-        if len(self.pH_history) >= 30:  # 5 minutes of data
-            recent_pH = list(self.pH_history)[-30:]
-            
-            # Count readings outside acceptable range
-            poor_count = sum(1 for pH in recent_pH if pH < 6.5 or pH > 8.5)
-            
-            if poor_count > 20:  # >66% of readings
-                events.append({
-                    'event_type': 'sustained_poor_pH',
-                    'severity': 'warning',
-                    'description': 'pH outside acceptable range for extended period',
-                    'timestamp': datetime.now()
-                })
-        
-        # Check turbidity trend
-        if len(self.turbidity_history) >= 30:
-            recent_turbidity = list(self.turbidity_history)[-30:]
-            
-            # Check if turbidity is consistently increasing
-            first_half = sum(recent_turbidity[:15]) / 15
-            second_half = sum(recent_turbidity[15:]) / 15
-            
-            if second_half > first_half * 1.5:
-                events.append({
-                    'event_type': 'increasing_turbidity_trend',
-                    'severity': 'info',
-                    'description': 'Turbidity showing increasing trend',
-                    'timestamp': datetime.now()
+        for step, bit in zip(*np.nonzero(fired)):
+            spec = _EVENT_SPECS[bit]
+            reading = [None if np.isnan(values[step]) else float(values[step]) for values in series]
+            event = {
+                'event_type': spec.event_type,
+                'severity': spec.severity,
+                'description': spec.template.format_map({
+                    'pH': reading[0],
+                    'turbidity': reading[1],
+                    'temperature': reading[2],
+                    'pH_change': float(change[METRIC_PH][step]),
+                    'increase_percent': float(increase_percent[step]),
+                    'temp_change': float(change[METRIC_TEMPERATURE][step])
                 })
+            }
+            if spec.with_readings:
+                event['pH'], event['turbidity'], event['temperature'] = reading
+            event['timestamp'] = timestamps[step] if timestamps is not None else None
+            events.append(event)
         
         return events
     
-    def _apply_cooldown(self, events: List[Dict]) -> List[Dict]:
-        """Filter events based on cooldown period"""
+    def _apply_cooldown(self, events: List, now_mono: float) -> List:
+        """
+        Filter events based on cooldown period
+        
+        Args:
+            events: _EventSpec records (anything with event_type and severity)
+            now_mono: Current time.monotonic() value
+        
+        Returns:
+            Events not suppressed by the cooldown
+        """
         filtered_events = []
-        current_time = datetime.now()
+        last_event_time = self.last_event_time
+        cooldown = self.event_cooldown
+        debug = logger.isEnabledFor(logging.DEBUG)
         
         for event in events:
-            event_key = f"{event['event_type']}_{event['severity']}"
+            event_key = (event.event_type, event.severity)
             
-            if event_key in self.last_event_time:
-                time_since_last = (current_time - self.last_event_time[event_key]).total_seconds()
-                
-                if time_since_last < self.event_cooldown:
-                    logger.debug(f"Event cooldown active for {event_key}")
-                    continue
+            last = last_event_time.get(event_key)
+            if last is not None and now_mono - last < cooldown:
+                if debug:
+                    logger.debug("Event cooldown active for %s/%s", *event_key)
+                continue
             
-            self.last_event_time[event_key] = current_time
+            last_event_time[event_key] = now_mono
             filtered_events.append(event)
         
         return filtered_events
@@ -333,30 +578,30 @@ class WaterQualityAnalyzer:
         stats = {}
         
         if self.pH_history:
-            pH_list = list(self.pH_history)
+            pH_values = self.pH_history.values()
             stats['pH'] = {
-                'current': pH_list[-1],
-                'average': sum(pH_list) / len(pH_list),
-                'min': min(pH_list),
-                'max': max(pH_list)
+                'current': float(pH_values[-1]),
+                'average': self.pH_history.mean(),
+                'min': float(pH_values.min()),
+                'max': float(pH_values.max())
             }
         
         if self.turbidity_history:
-            turb_list = list(self.turbidity_history)
+            turb_values = self.turbidity_history.values()
             stats['turbidity'] = {
-                'current': turb_list[-1],
-                'average': sum(turb_list) / len(turb_list),
-                'min': min(turb_list),
-                'max': max(turb_list)
+                'current': float(turb_values[-1]),
+                'average': self.turbidity_history.mean(),
+                'min': float(turb_values.min()),
+                'max': float(turb_values.max())
             }
         
         if self.temperature_history:
-            temp_list = list(self.temperature_history)
+            temp_values = self.temperature_history.values()
             stats['temperature'] = {
-                'current': temp_list[-1],
-                'average': sum(temp_list) / len(temp_list),
-                'min': min(temp_list),
-                'max': max(temp_list)
+                'current': float(temp_values[-1]),
+                'average': self.temperature_history.mean(),
+                'min': float(temp_values.min()),
+                'max': float(temp_values.max())
             }
         
         return stats
@@ -4,16 +4,80 @@ Classifies water quality based on sensor readings
 """
 
 import logging
-from typing import Dict
+from bisect import bisect_left, bisect_right
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# Classes are handled as small integer codes ordered worst to best, so
+# the overall class is the minimum code; 'unknown' sorts after all others
+CLASS_NAME = ('critical', 'poor', 'fair', 'good', 'excellent', 'unknown')
+CLASS_CODE = {name: code for code, name in enumerate(CLASS_NAME)}
+UNKNOWN_CODE = CLASS_CODE['unknown']
+
+# Score per class code
+_SCORE_LUT = (20, 40, 60, 80, 100, 0)
+
+_NAME_ARRAY = np.array(CLASS_NAME)
+_SCORE_ARRAY = np.array(_SCORE_LUT, dtype=np.int64)
+
+_CLASSIFICATION_DESCRIPTIONS = {
+    'excellent': 'Water quality is excellent. Safe for all uses including drinking (after proper treatment).',
+    'good': 'Water quality is good. Generally safe for most uses with minimal treatment.',
+    'fair': 'Water quality is fair. Suitable for uses with appropriate treatment. Monitor closely.',
+    'poor': 'Water quality is poor. Not recommended for sensitive uses. Investigation recommended.',
+    'critical': 'Water quality is critical. Immediate pollution event detected. Urgent action required.'
+}
+
+_CLASSIFICATION_RECOMMENDATIONS = {
+    'excellent': (
+        'Continue routine monitoring',
+        'Maintain current conditions',
+        'Regular maintenance of monitoring equipment'
+    ),
+    'good': (
+        'Continue monitoring',
+        'Review any recent changes in water source',
+        'Ensure proper filtration if used for drinking'
+    ),
+    'fair': (
+        'Increase monitoring frequency',
+        'Investigate potential sources of degradation',
+        'Consider additional treatment measures',
+        'Review environmental factors'
+    ),
+    'poor': (
+        'Immediately increase monitoring frequency',
+        'Investigate pollution sources',
+        'Restrict use for sensitive applications',
+        'Consider implementing corrective measures',
+        'Notify relevant authorities if required'
+    ),
+    'critical': (
+        'IMMEDIATE ACTION REQUIRED',
+        'Stop use for all sensitive applications',
+        'Identify and isolate pollution source',
+        'Notify environmental authorities',
+        'Implement emergency treatment measures',
+        'Consider evacuation of affected areas if necessary'
+    )
+}
+
 
 class WaterQualityClassifier:
     """Classifies water quality into categories"""
     
     QUALITY_CLASSES = ['excellent', 'good', 'fair', 'poor', 'critical']
     
+    # Ranges used when config.yaml leaves a class out
+    DEFAULT_THRESHOLDS = {
+        'pH': {'excellent': [6.5, 8.5], 'good': [6.0, 9.0], 'fair': [5.5, 9.5]},
+        'turbidity': {'excellent': [0, 5], 'good': [5, 10], 'fair': [10, 25], 'poor': [25, 100]},
+        'temperature': {'excellent': [15, 25], 'good': [10, 30], 'fair': [5, 35]}
+    }
+    
     def __init__(self, thresholds: Dict):
         """
         Initialize classifier with threshold configuration
@@ -22,8 +86,60 @@ class WaterQualityClassifier:
             thresholds: Dictionary containing threshold values
         """
         self.thresholds = thresholds
+        
+        # Lookup tables derived from the rule chains below (hard limits included)
+        self._pH_table = self._build_lookup(self._pH_rule, self._range_points('pH') + [5.0, 10.0])
+        self._turbidity_table = self._build_lookup(self._turbidity_rule, self._range_points('turbidity'))
+        self._temperature_table = self._build_lookup(self._temperature_rule, self._range_points('temperature') + [0, 40])
+        
+        # Array forms of the same tables for classify_batch
+        self._batch_tables = {
+            key: (np.array(table[0]), np.array(table[1]))
+            for key, table in (('pH', self._pH_table),
+                               ('turbidity', self._turbidity_table),
+                               ('temperature', self._temperature_table))
+        }
+        
         logger.info("Water quality classifier initialized")
     
+    def _range_points(self, parameter: str) -> List[float]:
+        """Collect every configured and default range endpoint for a parameter"""
+        points = []
+        for ranges in (self.DEFAULT_THRESHOLDS[parameter], self.thresholds.get(parameter, {})):
+            for bounds in ranges.values():
+                points.extend(bounds)
+        return points
+    
+    @staticmethod
+    def _build_lookup(rule: Callable[[float], str], points: List[float]) -> Tuple:
+        """
+        Precompute a rule's class for every region between boundary points
+        
+        With sorted points p[0..k-1], bisect_left(p, x) + bisect_right(p, x)
+        is 2i+1 when x == p[i] and 2i when x lies strictly between p[i-1]
+        and p[i]. No comparison in the rule changes truth value inside an
+        open interval, so one sample per region gives the exact answer.
+        
+        Returns:
+            Tuple of (sorted points, class code per region, code for NaN)
+        """
+        points = sorted(set(float(p) for p in points))
+        codes = []
+        for i, point in enumerate(points):
+            below = points[i - 1] if i else point - 1.0
+            codes.append(CLASS_CODE[rule((below + point) / 2)])
+            codes.append(CLASS_CODE[rule(point)])
+        codes.append(CLASS_CODE[rule(points[-1] + 1.0)])
+        return points, tuple(codes), CLASS_CODE[rule(float('nan'))]
+    
+    @staticmethod
+    def _lookup(table: Tuple, value: float) -> int:
+        """Classify a value with a table from _build_lookup"""
+        points, codes, nan_code = table
+        if value != value:
+            return nan_code
+        return codes[bisect_left(points, value) + bisect_right(points, value)]
+    
     def classify(self, readings: Dict) -> Dict:
         """
         Classify water quality based on sensor readings
@@ -36,47 +152,92 @@ class WaterQualityClassifier:
         """
         try:
             # Classify each parameter
-            pH_class = self._classify_pH(readings.get('pH'))
-            turbidity_class = self._classify_turbidity(readings.get('turbidity'))
-            temp_class = self._classify_temperature(readings.get('temperature'))
+            pH_code = self._classify_pH(readings.get('pH'))
+            turbidity_code = self._classify_turbidity(readings.get('turbidity'))
+            temp_code = self._classify_temperature(readings.get('temperature'))
             
             # Calculate overall classification (worst-case approach)
-            overall_class = self._get_worst_class([pH_class, turbidity_class, temp_class])
+            overall_code = self._get_worst_class([pH_code, turbidity_code, temp_code])
             
             # Calculate quality score (0-100)
-            score = self._calculate_score(pH_class, turbidity_class, temp_class)
+            score = self._calculate_score(pH_code, turbidity_code, temp_code)
             
             # Prepare details
             details = {
-                'pH_class': pH_class,
-                'turbidity_class': turbidity_class,
-                'temperature_class': temp_class
+                'pH_class': CLASS_NAME[pH_code],
+                'turbidity_class': CLASS_NAME[turbidity_code],
+                'temperature_class': CLASS_NAME[temp_code]
             }
             
             return {
-                'class': overall_class,
+                'class': CLASS_NAME[overall_code],
                 'score': score,
                 'details': details
             }
             
         except Exception as e:
-            logger.error(f"Error classifying water quality: {e}")
+            logger.error("Error classifying water quality: %s", e)
             return {
                 'class': 'unknown',
                 'score': 0,
                 'details': {}
             }
     
-    def _classify_pH(self, pH: float) -> str:
-        """Classify pH level"""
-        if pH is None:
-            return 'unknown'
+    def classify_batch(self, readings: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        Classify many readings at once
         
+        Args:
+            readings: Dictionary of equal-length pH, turbidity and temperature
+                arrays; NaN (or a missing key) marks a missing reading
+            
+        Returns:
+            Dictionary of arrays: 'class', 'score', 'pH_class',
+            'turbidity_class' and 'temperature_class'
+        """
+        arrays = {key: np.asarray(value, dtype=np.float64) for key, value in readings.items()}
+        size = len(next(iter(arrays.values()))) if arrays else 0
+        
+        codes = {}
+        for key, (points, label_codes) in self._batch_tables.items():
+            values = arrays.get(key)
+            if values is None:
+                codes[key] = np.full(size, UNKNOWN_CODE)
+                continue
+            regions = (np.searchsorted(points, values, side='left') +
+                       np.searchsorted(points, values, side='right'))
+            codes[key] = np.where(np.isnan(values), UNKNOWN_CODE, label_codes[regions])
+        
+        # Worst class wins; 'unknown' only when every parameter is missing
+        overall = np.minimum.reduce([codes['pH'], codes['turbidity'], codes['temperature']])
+        
+        # Weighted average (pH: 40%, turbidity: 40%, temperature: 20%)
+        score = (2 * _SCORE_ARRAY[codes['pH']] +
+                 2 * _SCORE_ARRAY[codes['turbidity']] +
+                 _SCORE_ARRAY[codes['temperature']]) // 5
+        
+        return {
+            'class': _NAME_ARRAY[overall],
+            'score': score,
+            'pH_class': _NAME_ARRAY[codes['pH']],
+            'turbidity_class': _NAME_ARRAY[codes['turbidity']],
+            'temperature_class': _NAME_ARRAY[codes['temperature']]
+        }
+    
+    def _classify_pH(self, pH: float) -> int:
+        """Classify pH level, as a class code"""
+        if pH is None:
+            return UNKNOWN_CODE
+        return self._lookup(self._pH_table, pH)
+    
+    def _pH_rule(self, pH: float) -> str:
+        """Reference pH classification, tabulated at init"""
         thresholds = self.thresholds.get('pH', {})
+        defaults = self.DEFAULT_THRESHOLDS['pH']
         
-        excellent = thresholds.get('excellent', [6.5, 8.5])
-        good = thresholds.get('good', [6.0, 9.0])
-        fair = thresholds.get('fair', [5.5, 9.5])
+        excellent = thresholds.get('excellent', defaults['excellent'])
+        good = thresholds.get('good', defaults['good'])
+        fair = thresholds.get('fair', defaults['fair'])
         
         if excellent[0] <= pH <= excellent[1]:
             return 'excellent'
@@ -89,17 +250,21 @@ class WaterQualityClassifier:
         else:
             return 'poor'
     
-    def _classify_turbidity(self, turbidity: float) -> str:
-        """Classify turbidity level"""
+    def _classify_turbidity(self, turbidity: float) -> int:
+        """Classify turbidity level, as a class code"""
         if turbidity is None:
-            return 'unknown'
-        
+            return UNKNOWN_CODE
+        return self._lookup(self._turbidity_table, turbidity)
+    
+    def _turbidity_rule(self, turbidity: float) -> str:
+        """Reference turbidity classification, tabulated at init"""
         thresholds = self.thresholds.get('turbidity', {})
+        defaults = self.DEFAULT_THRESHOLDS['turbidity']
         
-        excellent = thresholds.get('excellent', [0, 5])
-        good = thresholds.get('good', [5, 10])
-        fair = thresholds.get('fair', [10, 25])
-        poor = thresholds.get('poor', [25, 100])
+        excellent = thresholds.get('excellent', defaults['excellent'])
+        good = thresholds.get('good', defaults['good'])
+        fair = thresholds.get('fair', defaults['fair'])
+        poor = thresholds.get('poor', defaults['poor'])
         
         if excellent[0] <= turbidity < excellent[1]:
             return 'excellent'
@@ -112,16 +277,20 @@ class WaterQualityClassifier:
         else:
             return 'critical'
     
-    def _classify_temperature(self, temperature: float) -> str:
-        """Classify water temperature"""
+    def _classify_temperature(self, temperature: float) -> int:
+        """Classify water temperature, as a class code"""
         if temperature is None:
-            return 'unknown'
-        
+            return UNKNOWN_CODE
+        return self._lookup(self._temperature_table, temperature)
+    
+    def _temperature_rule(self, temperature: float) -> str:
+        """Reference temperature classification, tabulated at init"""
         thresholds = self.thresholds.get('temperature', {})
+        defaults = self.DEFAULT_THRESHOLDS['temperature']
         
-        excellent = thresholds.get('excellent', [15, 25])
-        good = thresholds.get('good', [10, 30])
-        fair = thresholds.get('fair', [5, 35])
+        excellent = thresholds.get('excellent', defaults['excellent'])
+        good = thresholds.get('good', defaults['good'])
+        fair = thresholds.get('fair', defaults['fair'])
         
         if excellent[0] <= temperature <= excellent[1]:
             return 'excellent'
@@ -134,98 +303,27 @@ class WaterQualityClassifier:
         else:
             return 'poor'
     
-    def _get_worst_class(self, classes: list) -> str:
-        """Get worst classification from a list"""
-        priority = {
-            'critical': 0,
-            'poor': 1,
-            'fair': 2,
-            'good': 3,
-            'excellent': 4,
-            'unknown': 5
-        }
-        
-        valid_classes = [c for c in classes if c != 'unknown']
-        if not valid_classes:
-            return 'unknown'
-        
-        worst = min(valid_classes, key=lambda x: priority.get(x, 5))
-        return worst
+    def _get_worst_class(self, codes: list) -> int:
+        """Get worst class code from a list ('unknown' only if all are unknown)"""
+        return min(codes)
     
-    def _calculate_score(self, pH_class: str, turbidity_class: str, temp_class: str) -> int:
+    def _calculate_score(self, pH_code: int, turbidity_code: int, temp_code: int) -> int:
         """
         Calculate overall water quality score (0-100)
         
         Higher score = better quality
         """
-        class_scores = {
-            'excellent': 100,
-            'good': 80,
-            'fair': 60,
-            'poor': 40,
-            'critical': 20,
-            'unknown': 0
-        }
-        
-        # Weighted average (pH: 40%, turbidity: 40%, temperature: 20%)
-        score = (
-            class_scores.get(pH_class, 0) * 0.4 +
-            class_scores.get(turbidity_class, 0) * 0.4 +
-            class_scores.get(temp_class, 0) * 0.2
-        )
-        
-        return int(score)
+        # Weighted average (pH: 40%, turbidity: 40%, temperature: 20%) in
+        # integer form; every class score is a multiple of 20, so this is exact
+        return (2 * _SCORE_LUT[pH_code] + 2 * _SCORE_LUT[turbidity_code] + _SCORE_LUT[temp_code]) // 5
     
     def get_classification_description(self, classification: str) -> str:
         """Get human-readable description of classification"""
-        descriptions = {
-            'excellent': 'Water quality is excellent. Safe for all uses including drinking (after proper treatment).',
-            'good': 'Water quality is good. Generally safe for most uses with minimal treatment.',
-            'fair': 'Water quality is fair. Suitable for uses with appropriate treatment. Monitor closely.',
-            'poor': 'Water quality is poor. Not recommended for sensitive uses. Investigation recommended.',
-            'critical': 'Water quality is critical. Immediate pollution event detected. Urgent action required.'
-        }
-        
-        return descriptions.get(classification, 'Unknown water quality status.')
+        return _CLASSIFICATION_DESCRIPTIONS.get(classification, 'Unknown water quality status.')
     
     def get_recommendations(self, classification: str) -> list:
         """Get recommendations based on classification"""
-        recommendations = {
-            'excellent': [
-                'Continue routine monitoring',
-                'Maintain current conditions',
-                'Regular maintenance of monitoring equipment'
-            ],
-            'good': [
-                'Continue monitoring',
-                'Review any recent changes in water source',
-                'Ensure proper filtration if used for drinking'
-            ],
-            'fair': [
-                'Increase monitoring frequency',
-                'Investigate potential sources of degradation',
-                'Consider additional treatment measures',
-                'Review environmental factors'
-            ],
-            'poor': [
-                'Immediately increase monitoring frequency',
-                'Investigate pollution sources',
-                'Restrict use for sensitive applications',
-                'Consider implementing corrective measures',
-                'Notify relevant authorities if required'
-            ],
-            'critical': [
-                'IMMEDIATE ACTION REQUIRED',
-                'Stop use for all sensitive applications',
-                'Identify and isolate pollution source',
-                'Notify environmental authorities',
-                'Implement emergency treatment measures',
-                'Consider evacuation of affected areas if necessary'
-            ]
-        }
-        
-        return recommendations.get(classification, ['Consult water quality expert'])
-
+        return list(_CLASSIFICATION_RECOMMENDATIONS.get(classification, ('Consult water quality expert',)))
 
 if __name__ == '__main__':
     # Test classifier
@@ -0,0 +1,137 @@
+"""
+Configuration Module
+Schema validation and typed settings for config.yaml
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+
+_RANGE = {
+    'type': 'array',
+    'items': {'type': 'number'},
+    'minItems': 2,
+    'maxItems': 2
+}
+
+CONFIG_SCHEMA = {
+    '$schema': 'https://json-schema.org/draft/2020-12/schema',
+    'type': 'object',
+    'required': ['system', 'database', 'sensors', 'thresholds', 'alerts'],
+    'properties': {
+        'system': {
+            'type': 'object',
+            'required': ['measurement_interval'],
+            'properties': {
+                'measurement_interval': {'type': 'number', 'exclusiveMinimum': 0},
+                'log_level': {'type': 'string'}
+            }
+        },
+        'database': {
+            'type': 'object',
+            'required': ['path'],
+            'properties': {
+                'path': {'type': 'string', 'minLength': 1},
+                'retention_days': {'type': 'integer', 'minimum': 1}
+            }
+        },
+        'sensors': {'type': 'object'},
+        'thresholds': {
+            'type': 'object',
+            'additionalProperties': {
+                'type': 'object',
+                'additionalProperties': _RANGE
+            }
+        },
+        'alerts': {
+            'type': 'object',
+            'properties': {
+                'email': {'type': 'object'},
+                'sms': {'type': 'object'},
+                'local': {'type': 'object'},
+                'dedupe_cooldown': {'type': 'number', 'minimum': 0}
+            }
+        }
+    }
+}
+
+# Compiled on first use: importing jsonschema costs more than parsing the
+# YAML, and a config served from the sidecar cache was already validated
+_validator = None
+
+
+@dataclass(slots=True, frozen=True)
+class Settings:
+    """Validated scalar settings, read as plain attributes"""
+    measurement_interval: float
+    db_path: str
+
+
+def _get_validator():
+    """Return the compiled schema validator, or None without jsonschema"""
+    global _validator
+    if _validator is None:
+        try:
+            from jsonschema import Draft202012Validator
+        except ImportError:
+            return None
+        _validator = Draft202012Validator(CONFIG_SCHEMA)
+    return _validator
+
+
+def validate_config(config: Dict):
+    """
+    Check a parsed configuration against CONFIG_SCHEMA
+    
+    Args:
+        config: Dictionary loaded from config.yaml
+    
+    Raises:
+        ValueError: If the configuration is invalid
+    """
+    validator = _get_validator()
+    if validator is not None:
+        from jsonschema.exceptions import best_match
+        error = best_match(validator.iter_errors(config))
+        if error is not None:
+            location = '/'.join(str(p) for p in error.absolute_path) or '<root>'
+            raise ValueError(f"{location}: {error.message}")
+    else:
+        # Without jsonschema, at least check the sections we index into
+        if not isinstance(config, dict):
+            raise ValueError("<root>: configuration must be a mapping")
+        for section in CONFIG_SCHEMA['required']:
+            if not isinstance(config.get(section), dict):
+                raise ValueError(f"{section}: missing or not a mapping")
+
+
+def load_settings(config: Dict, validate: bool = True) -> Settings:
+    """
+    Validate a parsed configuration and extract its settings
+    
+    Args:
+        config: Dictionary loaded from config.yaml
+        validate: False for a config that already passed validate_config()
+    
+    Returns:
+        Settings instance
+    
+    Raises:
+        ValueError: If the configuration is invalid
+    """
+    if validate:
+        validate_config(config)
+    
+    system = config['system']
+    database = config['database']
+    
+    try:
+        return Settings(
+            measurement_interval=float(system['measurement_interval']),
+            db_path=str(database['path'])
+        )
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid system/database settings: {e}")
@@ -6,25 +6,148 @@ Database operations for water quality data
 import sqlite3
 import csv
 import json
+import time
 import logging
-from typing import Dict, List, Optional
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
 from datetime import datetime
 from pathlib import Path
 
+import numpy as np
+
 logger = logging.getLogger(__name__)
 
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+# Readings are buffered and written in one transaction per batch by a
+# background writer, at least every READING_FLUSH_INTERVAL seconds
+READING_BATCH_SIZE = 32
+READING_FLUSH_INTERVAL = 1.0
+
+# A batch that fails to write is retried on later flushes, up to
+# MAX_FLUSH_ATTEMPTS in a row, and at most MAX_PENDING_READINGS are held;
+# beyond either limit readings are dropped (oldest first) and logged
+MAX_FLUSH_ATTEMPTS = 5
+MAX_PENDING_READINGS = 10000
+
+# Insert statements are kept as constants so every call passes the identical
+# string and hits sqlite3's prepared-statement cache
+INSERT_READING_SQL = (
+    "INSERT INTO readings (timestamp, pH, turbidity, temperature, quality_class, quality_score) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+INSERT_EVENT_SQL = (
+    "INSERT INTO events (timestamp, event_type, severity, description, pH, turbidity, temperature) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+STATEMENT_CACHE_SIZE = 256
+
+# The last RECENT_READINGS_SIZE readings are also kept in memory, one array
+# per field, so recent statistics need neither the database nor a flush
+RECENT_READINGS_SIZE = 360
+RECENT_FIELDS = ('pH', 'turbidity', 'temperature')
+
+# Old rows are deleted this many at a time, committing in between, so the
+# write lock is never held for long and the WAL stays small
+CLEANUP_CHUNK_SIZE = 1000
+DELETE_OLD_SQL = (
+    "DELETE FROM {table} WHERE rowid IN "
+    "(SELECT rowid FROM {table} WHERE timestamp < ? LIMIT ?)"
+)
+
+# Applied to every connection; WAL with synchronous=NORMAL only syncs at
+# checkpoints instead of on every commit, and busy_timeout lets writers on
+# different threads wait for each other instead of failing with SQLITE_BUSY
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-20000",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA busy_timeout=5000"
+)
+
+
+def _dump_json_row(row: Dict) -> bytes:
+    """Serialize one exported row as indented JSON, preferring orjson"""
+    if HAS_ORJSON:
+        return orjson.dumps(row, default=str, option=orjson.OPT_INDENT_2)
+    return json.dumps(row, indent=2, default=str).encode()
+
 
 class DataHandler:
     """Handles data storage and retrieval"""
     
-    def __init__(self, db_path='data/aquasentinel.db'):
+    def __init__(self, db_path='data/aquasentinel.db', batch_size=READING_BATCH_SIZE,
+                 flush_interval=READING_FLUSH_INTERVAL):
         Path(db_path).parent.mkdir(parents=True, exist_ok=True)
         self.db_path = db_path
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
-        self.conn.row_factory = sqlite3.Row
+        # One connection per thread, so the writer, the sensor loop and the
+        # dashboard never queue behind each other on a shared handle
+        self._local = threading.local()
+        self._connections = {}
+        self._connections_lock = threading.Lock()
+        self._closed = False
         self._create_tables()
+        
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = deque()
+        self._pending_lock = threading.Lock()
+        self._flush_failures = 0
+        # Readings given up on after repeated write failures
+        self.dropped_readings = 0
+        self._recent = {
+            field: np.full(RECENT_READINGS_SIZE, np.nan)
+            for field in RECENT_FIELDS
+        }
+        self._recent_idx = 0
+        self._recent_count = 0
+        # Keeps concurrent flushes from reordering batches
+        self._flush_lock = threading.Lock()
+        
+        # Background writer keeps commits off the sensor loop
+        self._wakeup = threading.Event()
+        self._closing = False
+        self._writer = threading.Thread(target=self._writer_loop, name='db-writer', daemon=True)
+        self._writer.start()
         logger.info(f"Database initialized: {db_path}")
     
+    def _connect(self) -> sqlite3.Connection:
+        # check_same_thread=False only so close() can close every thread's connection
+        conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                               cached_statements=STATEMENT_CACHE_SIZE)
+        conn.row_factory = sqlite3.Row
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        
+        with self._connections_lock:
+            # Drop connections left behind by threads that have since exited
+            for thread in [t for t in self._connections if not t.is_alive()]:
+                self._connections.pop(thread).close()
+            self._connections[threading.current_thread()] = conn
+        return conn
+    
+    @property
+    def conn(self) -> Optional[sqlite3.Connection]:
+        """This thread's connection, opened on first use"""
+        if self._closed:
+            return None
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+    
+    @property
+    def _in_transaction(self) -> bool:
+        return getattr(self._local, 'in_transaction', False)
+    
     def _create_tables(self):
         cursor = self.conn.cursor()
         
@@ -63,37 +186,165 @@ class DataHandler:
             )
         """)
         
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_readings_timestamp ON readings(timestamp)")
+        indexes_sql = "SELECT name FROM sqlite_master WHERE type = 'index'"
+        existing = {row[0] for row in cursor.execute(indexes_sql)}
+        
+        # Covers the timestamp range scans and the statistics aggregates, so
+        # neither has to touch the table; it supersedes the timestamp-only index
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_readings_cover
+            ON readings(timestamp, pH, turbidity, temperature)
+        """)
+        cursor.execute("DROP INDEX IF EXISTS idx_readings_timestamp")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_events_timestamp ON events(timestamp)")
+        # Severity-filtered event queries seek here and read rows already in order
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_events_sev_ts ON events(severity, timestamp DESC)")
+        # The quality distribution groups straight off this index, in order,
+        # without reading the table
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_readings_qc_ts ON readings(quality_class, timestamp)")
+        
+        # Refresh planner statistics so it picks up newly created indexes;
+        # only then, so a large database is not scanned on every startup
+        if {row[0] for row in cursor.execute(indexes_sql)} - existing:
+            cursor.execute("PRAGMA analysis_limit=400")
+            cursor.execute("ANALYZE")
         
         self.conn.commit()
     
     def save_reading(self, readings: Dict) -> bool:
+        """Queue a reading for the background writer"""
+        return self.save_readings_batch((readings,))
+    
+    def save_readings_batch(self, readings_list: Iterable[Dict]) -> bool:
+        """Queue several readings; the writer is woken once batch_size are pending"""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("""
-                INSERT INTO readings (pH, turbidity, temperature, quality_class, quality_score)
-                VALUES (?, ?, ?, ?, ?)
-            """, (
-                readings.get('pH'),
-                readings.get('turbidity'),
-                readings.get('temperature'),
-                readings.get('quality_class'),
-                readings.get('quality_score')
-            ))
-            self.conn.commit()
+            rows = []
+            for readings in readings_list:
+                # Stamp with the measurement time in CURRENT_TIMESTAMP format,
+                # since the row may be inserted well after it was taken
+                timestamp = time.strftime(
+                    '%Y-%m-%d %H:%M:%S',
+                    time.gmtime(readings.get('timestamp') or time.time())
+                )
+                rows.append((
+                    timestamp,
+                    readings.get('pH'),
+                    readings.get('turbidity'),
+                    readings.get('temperature'),
+                    readings.get('quality_class'),
+                    readings.get('quality_score')
+                ))
+            
+            # Missing values (None) become NaN
+            recent = np.array([row[1:4] for row in rows[-RECENT_READINGS_SIZE:]], dtype=np.float64)
+            
+            with self._pending_lock:
+                self._pending.extend(rows)
+                batch_full = len(self._pending) >= self.batch_size
+                if len(recent):
+                    slots = (self._recent_idx + np.arange(len(recent))) % RECENT_READINGS_SIZE
+                    for column, field in enumerate(RECENT_FIELDS):
+                        self._recent[field][slots] = recent[:, column]
+                    self._recent_idx = (self._recent_idx + len(recent)) % RECENT_READINGS_SIZE
+                    self._recent_count = min(self._recent_count + len(recent), RECENT_READINGS_SIZE)
+            
+            if batch_full:
+                self._wakeup.set()
             return True
         except Exception as e:
             logger.error(f"Failed to save reading: {e}")
             return False
     
+    def _writer_loop(self):
+        """Flush pending readings every flush_interval or when a batch fills up"""
+        while not self._closing:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+    
+    def flush(self) -> bool:
+        """
+        Write all pending readings in a single transaction
+        
+        Inside transaction() this does nothing: a failed batch could neither
+        be retried nor be kept out of the enclosing commit, and a rollback
+        would discard a written one. The rows stay queued for the writer.
+        """
+        if self._in_transaction:
+            return True
+        
+        with self._flush_lock:
+            with self._pending_lock:
+                if not self._pending:
+                    return True
+                rows = list(self._pending)
+                self._pending.clear()
+            
+            try:
+                self.conn.executemany(INSERT_READING_SQL, rows)
+                self.conn.commit()
+                self._flush_failures = 0
+                return True
+            except Exception as e:
+                logger.error(f"Failed to save {len(rows)} readings: {e}")
+                self.conn.rollback()
+                self._requeue(rows)
+                return False
+    
+    def _requeue(self, rows):
+        """Put unwritten rows back for the next flush, within the retry limits"""
+        self._flush_failures += 1
+        if self._flush_failures >= MAX_FLUSH_ATTEMPTS:
+            self._flush_failures = 0
+            self.dropped_readings += len(rows)
+            logger.error(f"Dropping {len(rows)} readings after {MAX_FLUSH_ATTEMPTS} failed writes")
+            return
+        
+        with self._pending_lock:
+            self._pending.extendleft(reversed(rows))
+            overflow = len(self._pending) - MAX_PENDING_READINGS
+            for _ in range(overflow):
+                self._pending.popleft()
+        if overflow > 0:
+            self.dropped_readings += overflow
+            logger.error(f"Dropping {overflow} oldest pending readings, "
+                         f"more than {MAX_PENDING_READINGS} are waiting to be written")
+    
+    def _commit(self):
+        """Commit now, unless an enclosing transaction() will commit later"""
+        if not self._in_transaction:
+            self.conn.commit()
+    
+    @contextmanager
+    def transaction(self):
+        """
+        Group several writes into a single commit
+        
+        Yields the handler itself, so callers write through it as usual:
+        
+            with data_handler.transaction() as tx:
+                for event in events:
+                    tx.save_event(event)
+        
+        save_reading() only queues for the batch writer, and flush() is
+        skipped while the transaction is open, so readings are never part
+        of it.
+        """
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        self._local.in_transaction = True
+        try:
+            yield self
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self._local.in_transaction = False
+    
     def save_event(self, event: Dict) -> bool:
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("""
-                INSERT INTO events (timestamp, event_type, severity, description, pH, turbidity, temperature)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (
+            self.conn.execute(INSERT_EVENT_SQL, (
                 event.get('timestamp', datetime.now()),
                 event.get('event_type'),
                 event.get('severity'),
@@ -102,7 +353,7 @@ class DataHandler:
                 event.get('turbidity'),
                 event.get('temperature')
             ))
-            self.conn.commit()
+            self._commit()
             return True
         except Exception as e:
             logger.error(f"Failed to save event: {e}")
@@ -110,6 +361,7 @@ class DataHandler:
     
     def get_readings(self, start_date=None, end_date=None, limit=100):
         try:
+            self.flush()
             cursor = self.conn.cursor()
             query = "SELECT * FROM readings WHERE 1=1"
             params = []
@@ -125,7 +377,7 @@ class DataHandler:
             params.append(limit)
             
             cursor.execute(query, params)
-            return [dict(row) for row in cursor.fetchall()]
+            return cursor.fetchall()
         except Exception as e:
             logger.error(f"Failed to get readings: {e}")
             return []
@@ -150,13 +402,14 @@ class DataHandler:
             params.append(limit)
             
             cursor.execute(query, params)
-            return [dict(row) for row in cursor.fetchall()]
+            return cursor.fetchall()
         except Exception as e:
             logger.error(f"Failed to get events: {e}")
             return []
     
     def get_statistics(self, start_date=None, end_date=None):
         try:
+            self.flush()
             cursor = self.conn.cursor()
             query = """
                 SELECT 
@@ -182,13 +435,66 @@ class DataHandler:
                 params.append(end_date)
             
             cursor.execute(query, params)
-            return dict(cursor.fetchone()) if cursor.fetchone() else {}
+            row = cursor.fetchone()
+            return dict(row) if row else {}
         except Exception as e:
             logger.error(f"Failed to get statistics: {e}")
             return {}
     
+    def recent_statistics(self) -> Dict:
+        """
+        Statistics over the last RECENT_READINGS_SIZE readings, from memory
+        
+        Returns:
+            Dictionary with the same keys as get_statistics
+        """
+        with self._pending_lock:
+            count = self._recent_count
+            recent = {field: values.copy() for field, values in self._recent.items()}
+        
+        stats = {'count': count}
+        for field, values in recent.items():
+            # Unfilled slots and missing readings are NaN
+            values = values[~np.isnan(values)]
+            if len(values):
+                stats[f'avg_{field}'] = float(values.mean())
+                stats[f'min_{field}'] = float(values.min())
+                stats[f'max_{field}'] = float(values.max())
+            else:
+                stats[f'avg_{field}'] = stats[f'min_{field}'] = stats[f'max_{field}'] = None
+        return stats
+    
+    def get_id_range(self):
+        """Return min/max ids of readings and events; changes when rows are added or purged"""
+        try:
+            self.flush()
+            cursor = self.conn.cursor()
+            cursor.execute("""
+                SELECT
+                    (SELECT MIN(id) FROM readings), (SELECT MAX(id) FROM readings),
+                    (SELECT MIN(id) FROM events), (SELECT MAX(id) FROM events)
+            """)
+            return tuple(cursor.fetchone())
+        except Exception as e:
+            logger.error(f"Failed to get id range: {e}")
+            return (None, None, None, None)
+    
+    def get_event_id_range(self):
+        """
+        Return min/max event ids; changes when events are added or purged
+        
+        Events are written directly rather than batched, so unlike
+        get_id_range() this is a plain read that never flushes readings.
+        """
+        try:
+            return tuple(self.conn.execute("SELECT MIN(id), MAX(id) FROM events").fetchone())
+        except Exception as e:
+            logger.error(f"Failed to get event id range: {e}")
+            return (None, None)
+    
     def get_quality_distribution(self, start_date=None):
         try:
+            self.flush()
             cursor = self.conn.cursor()
             query = "SELECT quality_class, COUNT(*) as count FROM readings WHERE 1=1"
             params = []
@@ -205,21 +511,40 @@ class DataHandler:
             logger.error(f"Failed to get distribution: {e}")
             return {}
     
+    def iter_readings(self, start_date=None, end_date=None, limit=None):
+        """Yield reading rows straight from the cursor, newest first"""
+        self.flush()
+        query = "SELECT * FROM readings WHERE 1=1"
+        params = []
+        
+        if start_date:
+            query += " AND timestamp >= ?"
+            params.append(start_date)
+        if end_date:
+            query += " AND timestamp <= ?"
+            params.append(end_date)
+        
+        query += " ORDER BY timestamp DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        yield from self.conn.execute(query, params)
+    
     def export_to_csv(self, output_file, start_date=None, end_date=None):
         try:
-            readings = self.get_readings(start_date, end_date, limit=100000)
-            
+            exported = 0
             with open(output_file, 'w', newline='') as f:
                 writer = csv.writer(f)
                 writer.writerow(['Timestamp', 'pH', 'Turbidity (NTU)', 'Temperature (°C)', 'Quality Class', 'Quality Score'])
                 
-                for r in readings:
-                    writer.writerow([
-                        r['timestamp'], r['pH'], r['turbidity'], 
+                for r in self.iter_readings(start_date, end_date):
+                    writer.writerow((
+                        r['timestamp'], r['pH'], r['turbidity'],
                         r['temperature'], r['quality_class'], r['quality_score']
-                    ])
+                    ))
+                    exported += 1
             
-            logger.info(f"Exported {len(readings)} readings to {output_file}")
+            logger.info(f"Exported {exported} readings to {output_file}")
             return True
         except Exception as e:
             logger.error(f"Export failed: {e}")
@@ -227,12 +552,16 @@ class DataHandler:
     
     def export_to_json(self, output_file, start_date=None, end_date=None):
         try:
-            readings = self.get_readings(start_date, end_date, limit=100000)
+            # Written one row at a time in the same layout as json.dump(rows, indent=2)
+            exported = 0
+            with open(output_file, 'wb') as f:
+                for r in self.iter_readings(start_date, end_date):
+                    f.write(b',\n  ' if exported else b'[\n  ')
+                    f.write(_dump_json_row(dict(r)).replace(b'\n', b'\n  '))
+                    exported += 1
+                f.write(b'\n]' if exported else b'[]')
             
-            with open(output_file, 'w') as f:
-                json.dump(readings, f, indent=2, default=str)
-            
-            logger.info(f"Exported {len(readings)} readings to {output_file}")
+            logger.info(f"Exported {exported} readings to {output_file}")
             return True
         except Exception as e:
             logger.error(f"Export failed: {e}")
@@ -240,19 +569,35 @@ class DataHandler:
     
     def cleanup_old_data(self, cutoff_date):
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("DELETE FROM readings WHERE timestamp < ?", (cutoff_date,))
-            readings_deleted = cursor.rowcount
-            cursor.execute("DELETE FROM events WHERE timestamp < ?", (cutoff_date,))
-            events_deleted = cursor.rowcount
-            self.conn.commit()
-            logger.info(f"Deleted {readings_deleted + events_deleted} old records")
-            return readings_deleted + events_deleted
+            self.flush()
+            deleted = 0
+            for table in ('readings', 'events'):
+                query = DELETE_OLD_SQL.format(table=table)
+                while True:
+                    rowcount = self.conn.execute(query, (cutoff_date, CLEANUP_CHUNK_SIZE)).rowcount
+                    self.conn.commit()
+                    deleted += rowcount
+                    if rowcount < CLEANUP_CHUNK_SIZE:
+                        break
+            
+            # Hand the freed pages back and reset the WAL file
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            logger.info(f"Deleted {deleted} old records")
+            return deleted
         except Exception as e:
             logger.error(f"Cleanup failed: {e}")
             return 0
     
     def close(self):
-        if self.conn:
-            self.conn.close()
+        if not self._closed:
+            # Stop the writer, then write whatever it left behind
+            self._closing = True
+            self._wakeup.set()
+            self._writer.join(timeout=5)
+            self.flush()
+            self._closed = True
+            with self._connections_lock:
+                for conn in self._connections.values():
+                    conn.close()
+                self._connections.clear()
             logger.info("Database closed")
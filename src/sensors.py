@@ -6,8 +6,11 @@ Handles pH, Turbidity, and Temperature sensors
 import time
 import logging
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Optional
-import random
+
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
@@ -36,22 +39,65 @@ except ImportError:
     HAS_GPIO = False
 
 
+# Simulated readings are drawn this many at a time
+SIMULATION_BUFFER_SIZE = 4096
+
+
+class _SimulatedSignal:
+    """Uniform noise around a base value, generated in blocks and rounded like real readings"""
+    
+    __slots__ = ('base', 'low', 'high', 'decimals', '_rng', '_values', '_idx')
+    
+    def __init__(self, base: float, low: float, high: float, decimals: int):
+        self.base = base
+        self.low = low
+        self.high = high
+        self.decimals = decimals
+        self._rng = np.random.default_rng()
+        self._values = []
+        self._idx = 0
+    
+    def __call__(self) -> float:
+        if self._idx == len(self._values):
+            noise = self._rng.uniform(self.low, self.high, SIMULATION_BUFFER_SIZE)
+            # Plain floats, so values bind to sqlite and serialize like real readings
+            self._values = np.round(self.base + noise, self.decimals).tolist()
+            self._idx = 0
+        value = self._values[self._idx]
+        self._idx += 1
+        return value
+
+
+def _validated(value: float, valid_range, decimals: int, name: str) -> Optional[float]:
+    """Round a reading, or return None if it is outside valid_range (NaN never passes)"""
+    low, high = valid_range
+    if low <= value <= high:
+        return round(value, decimals)
+    logger.warning(f"Invalid {name} reading: {value}")
+    return None
+
+
 class PHSensor:
     """pH Sensor (Analog via ADS1115)"""
     
+    VALID_RANGE = (0.0, 14.0)
+    
+    DEFAULT_CALIBRATION = {
+        'slope': 3.5,  # Default: 3.5V per pH unit
+        'offset': 7.0,  # Default: pH 7 at 2.5V
+        'voltage_at_7': 2.5
+    }
+    
     def __init__(self, adc, channel, config: Dict):
         """Initialize pH sensor"""
         self.adc = adc
         self.channel = channel
         self.config = config
         self.simulation_mode = adc is None
+        self._simulated = _SimulatedSignal(7.2, -0.3, 0.3, 2)
         
-        # Load calibration data
-        self.calibration = config.get('calibration', {
-            'slope': 3.5,  # Default: 3.5V per pH unit
-            'offset': 7.0,  # Default: pH 7 at 2.5V
-            'voltage_at_7': 2.5
-        })
+        # Load calibration data (missing keys fall back to the defaults)
+        self.calibration = config.get('calibration') or {}
         
         if self.simulation_mode:
             logger.info("pH sensor running in simulation mode")
@@ -75,25 +121,30 @@ class PHSensor:
             # Convert voltage to pH using calibration
             pH = self._voltage_to_pH(voltage)
             
-            # Validate reading
-            if 0 <= pH <= 14:
-                return round(pH, 2)
-            else:
-                logger.warning(f"Invalid pH reading: {pH}")
-                return None
-                
+            return _validated(pH, self.VALID_RANGE, 2, 'pH')
+        
         except Exception as e:
             logger.error(f"Error reading pH sensor: {e}")
             return None
     
+    @property
+    def calibration(self) -> Dict:
+        return self._calibration
+    
+    @calibration.setter
+    def calibration(self, calibration: Dict):
+        self._calibration = {**self.DEFAULT_CALIBRATION, **calibration}
+        self._update_conversion()
+    
+    def _update_conversion(self):
+        """Cache the conversion constants derived from the calibration"""
+        self._volts_per_pH = self._calibration['slope'] / 7.0
+        self._voltage_at_7 = self._calibration['voltage_at_7']
+    
     def _voltage_to_pH(self, voltage: float) -> float:
         """Convert voltage to pH using calibration data"""
         # Linear conversion: pH = (voltage - voltage_at_7) / slope + 7
-        slope = self.calibration['slope'] / 7.0  # Voltage per pH unit
-        offset_voltage = self.calibration['voltage_at_7']
-        
-        pH = ((voltage - offset_voltage) / slope) + 7.0
-        return pH
+        return ((voltage - self._voltage_at_7) / self._volts_per_pH) + 7.0
     
     def calibrate(self, calibration_points: Dict):
         """
@@ -107,53 +158,49 @@ class PHSensor:
             return False
         
         try:
-            # Use linear regression for calibration
-            pH_values = list(calibration_points.keys())
-            voltages = list(calibration_points.values())
-            
-            # Calculate slope and offset
-            n = len(pH_values)
-            sum_pH = sum(pH_values)
-            sum_v = sum(voltages)
-            sum_pH_v = sum(pH * v for pH, v in zip(pH_values, voltages))
-            sum_pH_sq = sum(pH * pH for pH in pH_values)
-            
-            slope = (n * sum_pH_v - sum_pH * sum_v) / (n * sum_pH_sq - sum_pH * sum_pH)
-            offset = (sum_v - slope * sum_pH) / n
+            # Least-squares line voltage = slope * pH + offset
+            pH_values = np.fromiter(calibration_points.keys(), dtype=np.float64)
+            voltages = np.fromiter(calibration_points.values(), dtype=np.float64)
+            slope, offset = (float(c) for c in np.polyfit(pH_values, voltages, 1))
             
             self.calibration['slope'] = slope
             self.calibration['offset'] = offset
             self.calibration['voltage_at_7'] = offset + 7.0 * slope
+            self._update_conversion()
             
             logger.info(f"pH sensor calibrated: slope={slope:.4f}, offset={offset:.4f}")
             return True
-            
+        
         except Exception as e:
             logger.error(f"Calibration failed: {e}")
             return False
     
     def _simulate_reading(self) -> float:
         """Simulate pH reading for testing"""
-        base_pH = 7.2
-        return round(base_pH + random.uniform(-0.3, 0.3), 2)
+        return self._simulated()
 
 
 class TurbiditySensor:
     """Turbidity Sensor (Analog via ADS1115)"""
     
+    VALID_RANGE = (0.0, 5000.0)
+    
+    DEFAULT_CALIBRATION = {
+        'clear_water_voltage': 4.2,  # Voltage for clear water
+        'max_turbidity': 3000,  # Maximum NTU
+        'min_voltage': 0.5  # Voltage at max turbidity
+    }
+    
     def __init__(self, adc, channel, config: Dict):
         """Initialize turbidity sensor"""
         self.adc = adc
         self.channel = channel
         self.config = config
         self.simulation_mode = adc is None
+        self._simulated = _SimulatedSignal(8.5, -2, 4, 1)
         
-        # Load calibration data
-        self.calibration = config.get('calibration', {
-            'clear_water_voltage': 4.2,  # Voltage for clear water
-            'max_turbidity': 3000,  # Maximum NTU
-            'min_voltage': 0.5  # Voltage at max turbidity
-        })
+        # Load calibration data (missing keys fall back to the defaults)
+        self.calibration = config.get('calibration') or {}
         
         if self.simulation_mode:
             logger.info("Turbidity sensor running in simulation mode")
@@ -177,30 +224,36 @@ class TurbiditySensor:
             # Convert voltage to NTU using calibration
             turbidity = self._voltage_to_ntu(voltage)
             
-            # Validate reading
-            if 0 <= turbidity <= 5000:
-                return round(turbidity, 1)
-            else:
-                logger.warning(f"Invalid turbidity reading: {turbidity}")
-                return None
-                
+            return _validated(turbidity, self.VALID_RANGE, 1, 'turbidity')
+        
         except Exception as e:
             logger.error(f"Error reading turbidity sensor: {e}")
             return None
     
+    @property
+    def calibration(self) -> Dict:
+        return self._calibration
+    
+    @calibration.setter
+    def calibration(self, calibration: Dict):
+        self._calibration = {**self.DEFAULT_CALIBRATION, **calibration}
+        self._update_conversion()
+    
+    def _update_conversion(self):
+        """Cache the conversion constants derived from the calibration"""
+        self._clear_voltage = self._calibration['clear_water_voltage']
+        self._ntu_per_volt = self._calibration['max_turbidity'] / (
+            self._clear_voltage - self._calibration['min_voltage']
+        )
+    
     def _voltage_to_ntu(self, voltage: float) -> float:
         """Convert voltage to NTU using calibration data"""
-        clear_voltage = self.calibration['clear_water_voltage']
-        min_voltage = self.calibration['min_voltage']
-        max_turbidity = self.calibration['max_turbidity']
-        
         # Inverse relationship: lower voltage = higher turbidity
-        if voltage >= clear_voltage:
+        if voltage >= self._clear_voltage:
             return 0.0
         
         # Linear mapping
-        ntu = max_turbidity * (clear_voltage - voltage) / (clear_voltage - min_voltage)
-        return max(0, ntu)
+        return max(0, self._ntu_per_volt * (self._clear_voltage - voltage))
     
     def calibrate(self, clear_water_voltage: float):
         """
@@ -210,23 +263,26 @@ class TurbiditySensor:
             clear_water_voltage: Voltage reading in clear/distilled water
         """
         self.calibration['clear_water_voltage'] = clear_water_voltage
+        self._update_conversion()
         logger.info(f"Turbidity sensor calibrated: clear={clear_water_voltage:.2f}V")
         return True
     
     def _simulate_reading(self) -> float:
         """Simulate turbidity reading for testing"""
-        base_ntu = 8.5
-        return round(base_ntu + random.uniform(-2, 4), 1)
+        return self._simulated()
 
 
 class TemperatureSensor:
     """DS18B20 Waterproof Temperature Sensor"""
     
+    VALID_RANGE = (-10.0, 50.0)
+    
     def __init__(self, config: Dict):
         """Initialize temperature sensor"""
         self.config = config
         self.sensor = None
         self.simulation_mode = not HAS_DS18B20
+        self._simulated = _SimulatedSignal(22.5, -1, 2, 1)
         
         if not self.simulation_mode:
             try:
@@ -256,21 +312,20 @@ class TemperatureSensor:
             offset = self.config.get('calibration_offset', 0.0)
             temperature += offset
             
-            # Validate reading
-            if -10 <= temperature <= 50:
-                return round(temperature, 1)
-            else:
-                logger.warning(f"Invalid temperature reading: {temperature}")
-                return None
-                
+            return _validated(temperature, self.VALID_RANGE, 1, 'temperature')
+        
         except Exception as e:
             logger.error(f"Error reading temperature sensor: {e}")
             return None
     
     def _simulate_reading(self) -> float:
         """Simulate temperature reading for testing"""
-        base_temp = 22.5
-        return round(base_temp + random.uniform(-1, 2), 1)
+        return self._simulated()
+
+
+# Buzzer tone; PWM keeps toggling the pin in the background while beeping
+BUZZER_FREQUENCY = 2000
+BUZZER_DUTY_CYCLE = 50
 
 
 class StatusIndicators:
@@ -280,6 +335,9 @@ class StatusIndicators:
         """Initialize GPIO indicators"""
         self.config = config
         self.simulation_mode = not HAS_GPIO
+        self._pwm = None
+        self._beep_timer = None
+        self._beep_lock = threading.Lock()
         
         if not self.simulation_mode:
             try:
@@ -298,6 +356,7 @@ class StatusIndicators:
                 
                 self.set_led('off')
                 GPIO.output(self.buzzer, GPIO.LOW)
+                self._pwm = GPIO.PWM(self.buzzer, config.get('buzzer_frequency', BUZZER_FREQUENCY))
                 
                 logger.info("Status indicators initialized")
             except Exception as e:
@@ -330,20 +389,57 @@ class StatusIndicators:
             GPIO.output(self.led_blue, b)
     
     def beep(self, duration=0.2, count=1):
-        """Sound buzzer"""
+        """
+        Sound buzzer without blocking the caller
+        
+        Each beep and each gap lasts duration seconds; timers switch the PWM
+        on and off, and a new beep replaces any pattern still playing.
+        """
         if self.simulation_mode:
             logger.debug(f"[SIM] Beep: {count}x")
             return
         
-        for _ in range(count):
-            GPIO.output(self.buzzer, GPIO.HIGH)
-            time.sleep(duration)
-            GPIO.output(self.buzzer, GPIO.LOW)
-            time.sleep(duration)
+        if count < 1:
+            return
+        
+        with self._beep_lock:
+            self._cancel_beep()
+            self._pwm.start(BUZZER_DUTY_CYCLE)
+            self._schedule_beep(duration, self._beep_off, duration, count - 1)
+    
+    def _beep_on(self, duration, remaining):
+        with self._beep_lock:
+            if threading.current_thread() is not self._beep_timer:
+                return  # Superseded by a newer beep
+            self._pwm.start(BUZZER_DUTY_CYCLE)
+            self._schedule_beep(duration, self._beep_off, duration, remaining - 1)
+    
+    def _beep_off(self, duration, remaining):
+        with self._beep_lock:
+            if threading.current_thread() is not self._beep_timer:
+                return  # Superseded by a newer beep
+            self._pwm.stop()
+            if remaining > 0:
+                self._schedule_beep(duration, self._beep_on, duration, remaining)
+            else:
+                self._beep_timer = None
+    
+    def _schedule_beep(self, delay, step, *args):
+        self._beep_timer = threading.Timer(delay, step, args)
+        self._beep_timer.daemon = True
+        self._beep_timer.start()
+    
+    def _cancel_beep(self):
+        if self._beep_timer is not None:
+            self._beep_timer.cancel()
+            self._beep_timer = None
+        self._pwm.stop()
     
     def cleanup(self):
         """Cleanup GPIO"""
         if not self.simulation_mode:
+            with self._beep_lock:
+                self._cancel_beep()
             GPIO.cleanup()
 
 
@@ -396,15 +492,29 @@ class SensorManager:
             config.get('indicators', {})
         )
         
+        # Sensors are read concurrently. Both analog channels go through the
+        # same ADS1115 and take turns on its lock; the DS18B20 is on 1-Wire
+        # and its ~750 ms conversion overlaps with them.
+        self._adc_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=3, thread_name_prefix='sensor')
+        
         logger.info("Sensor manager initialized")
     
+    def _read_adc_sensor(self, sensor) -> Optional[float]:
+        """Read an ADS1115-backed sensor while holding the ADC"""
+        with self._adc_lock:
+            return sensor.read()
+    
     def read_all(self) -> Optional[Dict]:
         """Read all sensors"""
         try:
             # Read all sensors
-            pH = self.pH_sensor.read()
-            turbidity = self.turbidity_sensor.read()
-            temperature = self.temperature_sensor.read()
+            pH_future = self._pool.submit(self._read_adc_sensor, self.pH_sensor)
+            turbidity_future = self._pool.submit(self._read_adc_sensor, self.turbidity_sensor)
+            temperature_future = self._pool.submit(self.temperature_sensor.read)
+            pH = pH_future.result()
+            turbidity = turbidity_future.result()
+            temperature = temperature_future.result()
             
             # Verify all readings are valid
             if pH is not None and turbidity is not None and temperature is not None:
@@ -419,7 +529,7 @@ class SensorManager:
             else:
                 logger.warning("Failed to read one or more sensors")
                 return None
-                
+        
         except Exception as e:
             logger.error(f"Error reading sensors: {e}")
             return None
@@ -462,6 +572,7 @@ class SensorManager:
     def cleanup(self):
         """Cleanup all sensors"""
         logger.info("Cleaning up sensors")
+        self._pool.shutdown(wait=True)
         self.indicators.cleanup()
 
 
@@ -0,0 +1,168 @@
+const UPDATE_INTERVAL = 10000;
+
+// Looked up once; the script runs after the markup it touches
+const EL = Object.fromEntries([
+    'pH', 'pH-status', 'pH-time',
+    'turbidity', 'turbidity-status', 'turbidity-time',
+    'temperature', 'temp-status', 'temp-time',
+    'quality-score', 'quality-status', 'quality-time',
+    'events-container'
+].map(id => [id, document.getElementById(id)]));
+
+function applyReadings(result) {
+    if (result.success) {
+        // All writes land together in the next frame
+        requestAnimationFrame(() => renderReadings(result.data));
+    }
+}
+
+function renderReadings(data) {
+    const now = new Date().toLocaleTimeString();
+
+    if (data.pH) {
+        EL['pH'].textContent = data.pH.toFixed(2);
+        applyStatus(EL['pH-status'], withinRanges(data.pH, PH_RANGES));
+    }
+
+    if (data.turbidity) {
+        EL['turbidity'].innerHTML = data.turbidity.toFixed(1) + '<span class="unit">NTU</span>';
+        applyStatus(EL['turbidity-status'], belowBands(data.turbidity, TURBIDITY_BANDS));
+    }
+
+    if (data.temperature) {
+        EL['temperature'].innerHTML = data.temperature.toFixed(1) + '<span class="unit">°C</span>';
+        applyStatus(EL['temp-status'], withinRanges(data.temperature, TEMP_RANGES));
+    }
+
+    if (data.quality_class && data.quality_score) {
+        EL['quality-score'].innerHTML = data.quality_score + '<span class="unit">/100</span>';
+        applyStatus(EL['quality-status'], STATUS[data.quality_class] || STATUS.unknown);
+    }
+
+    ['pH', 'turbidity', 'temp', 'quality'].forEach(id => {
+        EL[id + '-time'].textContent = 'Updated: ' + now;
+    });
+}
+
+// Status badge class and label for each quality level, built once
+const STATUS = Object.fromEntries(['excellent', 'good', 'fair', 'poor', 'critical', 'unknown'].map(
+    level => [level, ['status status-' + level, level.charAt(0).toUpperCase() + level.slice(1)]]
+));
+
+// Nested inclusive [low, high] ranges, best first; outside all of them is critical
+const PH_RANGES = [[6.5, 8.5, STATUS.excellent], [6.0, 9.0, STATUS.good], [5.5, 9.5, STATUS.fair]];
+const TEMP_RANGES = [[15, 25, STATUS.excellent], [10, 30, STATUS.good], [5, 35, STATUS.fair]];
+// Ascending exclusive upper bounds
+const TURBIDITY_BANDS = [[5, STATUS.excellent], [10, STATUS.good], [25, STATUS.fair], [100, STATUS.poor], [Infinity, STATUS.critical]];
+
+function withinRanges(value, ranges) {
+    for (const [low, high, status] of ranges) {
+        if (value >= low && value <= high) return status;
+    }
+    return STATUS.critical;
+}
+
+function belowBands(value, bands) {
+    for (const [high, status] of bands) {
+        if (value < high) return status;
+    }
+    return STATUS.critical;
+}
+
+// Only touches the element when the status actually changes
+function applyStatus(el, [className, label]) {
+    if (el.className !== className) el.className = className;
+    if (el.textContent !== label) el.textContent = label;
+}
+
+// The events list arrives already rendered by the server
+function applyEventsHtml(html) {
+    EL['events-container'].innerHTML = html;
+}
+
+// Sent back as If-None-Match; while it is current the server leaves the
+// events out, so an idle poll only carries the readings
+let eventsEtag = '';
+
+// Readings and events from one request, for the first render and each poll
+async function pollTick() {
+    try {
+        const response = await fetch('/api/bootstrap?hours=24', {
+            cache: 'no-store',
+            headers: eventsEtag ? {'If-None-Match': eventsEtag} : {}
+        });
+        const result = await response.json();
+
+        if (result.success) {
+            if (result.current) {
+                applyReadings({success: true, data: result.current});
+            }
+            if (result.events_html !== undefined) {
+                eventsEtag = response.headers.get('ETag') || '';
+                applyEventsHtml(result.events_html);
+            }
+        }
+    } catch (error) {
+        console.error('Error fetching dashboard data:', error);
+    }
+}
+
+// Readings and events are pushed over /api/stream; poll only if it is unavailable
+let pollTimer = null;
+
+function startPolling() {
+    if (pollTimer === null) {
+        pollTick();
+        pollTimer = setInterval(pollTick, UPDATE_INTERVAL);
+    }
+}
+
+function stopPolling() {
+    if (pollTimer !== null) {
+        clearInterval(pollTimer);
+        pollTimer = null;
+    }
+}
+
+let stream = null;
+
+function connect() {
+    if (!window.EventSource) {
+        startPolling();
+        return;
+    }
+    stream = new EventSource('/api/stream');
+    stream.onmessage = e => {
+        stopPolling();
+        applyReadings(JSON.parse(e.data));
+    };
+    stream.addEventListener('events', e => {
+        stopPolling();
+        applyEventsHtml(JSON.parse(e.data));
+    });
+    stream.onerror = startPolling;
+}
+
+function disconnect() {
+    if (stream !== null) {
+        stream.close();
+        stream = null;
+    }
+    stopPolling();
+}
+
+// Hidden tabs drop the stream (and any polling), so the server stops reading
+// the sensors once nobody is looking; the stream resends the latest state on
+// reconnect
+document.addEventListener('visibilitychange', () => {
+    if (document.hidden) {
+        disconnect();
+    } else if (stream === null) {
+        connect();
+    }
+});
+
+if (!document.hidden) {
+    connect();
+}
+pollTick();
@@ -3,12 +3,65 @@ Web Dashboard Module
 Flask web interface for water quality monitoring
 """
 
-from flask import Flask, render_template_string, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from itertools import chain
+import gzip
+import hashlib
 import logging
+import queue
+import re
+import threading
+import time
+from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+try:
+    import brotli
+    HAS_BROTLI = True
+except ImportError:
+    HAS_BROTLI = False
+
+try:
+    from flask_compress import Compress
+    HAS_FLASK_COMPRESS = True
+except ImportError:
+    HAS_FLASK_COMPRESS = False
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+# Open /api/stream connections are sent a comment this often when idle, so
+# dead clients are noticed and proxies keep the connection open
+STREAM_KEEPALIVE = 15
+# Messages buffered per stream client; a client that falls further behind
+# skips readings rather than growing the queue
+STREAM_QUEUE_SIZE = 8
+# The stream only pushes a reading once a metric moves by more than this
+# from the last one pushed, or the quality class changes
+STREAM_EPSILON = {'pH': 0.05, 'turbidity': 0.5, 'temperature': 0.2}
+# Sensor reads within this many seconds of each other share one result
+CURRENT_TTL = 1.0
+# Most readings returned by /api/history
+HISTORY_LIMIT = 1000
+# ?hours= defaults to DEFAULT_HOURS and is clamped to HOURS_RANGE
+DEFAULT_HOURS = 24
+HOURS_RANGE = (1, 720)
+_INTEGER_RE = re.compile(r'-?\d+')
+# Events shown on the dashboard
+EVENTS_SHOWN = 10
+
+# CSS and JS are served from here; their URLs carry a content hash, so
+# browsers can cache them for STATIC_MAX_AGE and still see every change
+STATIC_DIR = Path(__file__).parent / 'static'
+STATIC_MAX_AGE = 86400
+
 HTML_TEMPLATE = """
 <!DOCTYPE html>
 <html lang="en">
@@ -16,40 +69,7 @@ HTML_TEMPLATE = """
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>AquaSentinel-Pi5 Dashboard</title>
-    <style>
-        * { margin: 0; padding: 0; box-sizing: border-box; }
-        body {
-            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
-            background: linear-gradient(135deg, #0093E9 0%, #80D0C7 100%);
-            min-height: 100vh;
-            padding: 20px;
-        }
-        .container { max-width: 1400px; margin: 0 auto; }
-        header { text-align: center; color: white; margin-bottom: 30px; }
-        h1 { font-size: 2.5em; margin-bottom: 10px; }
-        .dashboard { display: grid; grid-template-columns: repeat(auto-fit, minmax(300px, 1fr)); gap: 20px; margin-bottom: 30px; }
-        .card {
-            background: white;
-            border-radius: 15px;
-            padding: 25px;
-            box-shadow: 0 10px 30px rgba(0, 0, 0, 0.2);
-        }
-        .card-title { font-size: 1.2em; color: #333; margin-bottom: 15px; }
-        .metric { font-size: 3em; font-weight: bold; color: #0093E9; margin: 10px 0; }
-        .unit { font-size: 0.5em; color: #666; }
-        .status { display: inline-block; padding: 5px 15px; border-radius: 20px; font-size: 0.9em; margin-top: 10px; }
-        .status-excellent { background: #d4edda; color: #155724; }
-        .status-good { background: #d1ecf1; color: #0c5460; }
-        .status-fair { background: #fff3cd; color: #856404; }
-        .status-poor { background: #f8d7da; color: #721c24; }
-        .status-critical { background: #f5c6cb; color: #721c24; font-weight: bold; }
-        .events-section { background: white; border-radius: 15px; padding: 25px; box-shadow: 0 10px 30px rgba(0, 0, 0, 0.2); }
-        .event-item { padding: 15px; margin: 10px 0; border-radius: 8px; border-left: 4px solid; }
-        .event-critical { background: #f8d7da; border-left-color: #dc3545; }
-        .event-warning { background: #fff3cd; border-left-color: #ffc107; }
-        .event-info { background: #d1ecf1; border-left-color: #17a2b8; }
-        .timestamp { color: #999; font-size: 0.9em; margin-top: 10px; }
-    </style>
+    <link rel="stylesheet" href="/static/dashboard.css?v={css_version}">
 </head>
 <body>
     <div class="container">
@@ -89,184 +109,405 @@ HTML_TEMPLATE = """
         </div>
         
         <div class="events-section">
-            <h2 style="margin-bottom: 20px;">Recent Events</h2>
+            <h2>Recent Events</h2>
             <div id="events-container">
-                <div style="text-align: center; padding: 20px; color: #666;">Loading events...</div>
+                <div class="placeholder">Loading events...</div>
             </div>
         </div>
     </div>
     
-    <script>
-        const UPDATE_INTERVAL = 10000;
-        
-        async function updateReadings() {
-            try {
-                const response = await fetch('/api/current');
-                const result = await response.json();
-                
-                if (result.success) {
-                    const data = result.data;
-                    const now = new Date().toLocaleTimeString();
-                    
-                    if (data.pH) {
-                        document.getElementById('pH').textContent = data.pH.toFixed(2);
-                        updateStatus('pH', data.pH, [6.5, 8.5], [6.0, 9.0], [5.5, 9.5]);
-                    }
-                    
-                    if (data.turbidity) {
-                        document.getElementById('turbidity').innerHTML = data.turbidity.toFixed(1) + '<span class="unit">NTU</span>';
-                        updateTurbidityStatus(data.turbidity);
-                    }
-                    
-                    if (data.temperature) {
-                        document.getElementById('temperature').innerHTML = data.temperature.toFixed(1) + '<span class="unit">°C</span>';
-                        updateTempStatus(data.temperature);
-                    }
-                    
-                    if (data.quality_class && data.quality_score) {
-                        document.getElementById('quality-score').innerHTML = data.quality_score + '<span class="unit">/100</span>';
-                        const statusEl = document.getElementById('quality-status');
-                        statusEl.className = 'status status-' + data.quality_class;
-                        statusEl.textContent = data.quality_class.charAt(0).toUpperCase() + data.quality_class.slice(1);
-                    }
-                    
-                    ['pH', 'turbidity', 'temp', 'quality'].forEach(id => {
-                        document.getElementById(id + '-time').textContent = 'Updated: ' + now;
-                    });
-                }
-            } catch (error) {
-                console.error('Error fetching readings:', error);
-            }
-        }
-        
-        function updateStatus(prefix, value, excellent, good, fair) {
-            const statusEl = document.getElementById(prefix + '-status');
-            if (value >= excellent[0] && value <= excellent[1]) {
-                statusEl.className = 'status status-excellent';
-                statusEl.textContent = 'Excellent';
-            } else if (value >= good[0] && value <= good[1]) {
-                statusEl.className = 'status status-good';
-                statusEl.textContent = 'Good';
-            } else if (value >= fair[0] && value <= fair[1]) {
-                statusEl.className = 'status status-fair';
-                statusEl.textContent = 'Fair';
-            } else {
-                statusEl.className = 'status status-critical';
-                statusEl.textContent = 'Critical';
-            }
-        }
-        
-        function updateTurbidityStatus(value) {
-            const statusEl = document.getElementById('turbidity-status');
-            if (value < 5) {
-                statusEl.className = 'status status-excellent';
-                statusEl.textContent = 'Excellent';
-            } else if (value < 10) {
-                statusEl.className = 'status status-good';
-                statusEl.textContent = 'Good';
-            } else if (value < 25) {
-                statusEl.className = 'status status-fair';
-                statusEl.textContent = 'Fair';
-            } else if (value < 100) {
-                statusEl.className = 'status status-poor';
-                statusEl.textContent = 'Poor';
-            } else {
-                statusEl.className = 'status status-critical';
-                statusEl.textContent = 'Critical';
-            }
-        }
-        
-        function updateTempStatus(value) {
-            const statusEl = document.getElementById('temp-status');
-            if (value >= 15 && value <= 25) {
-                statusEl.className = 'status status-excellent';
-                statusEl.textContent = 'Excellent';
-            } else if (value >= 10 && value <= 30) {
-                statusEl.className = 'status status-good';
-                statusEl.textContent = 'Good';
-            } else if (value >= 5 && value <= 35) {
-                statusEl.className = 'status status-fair';
-                statusEl.textContent = 'Fair';
-            } else {
-                statusEl.className = 'status status-critical';
-                statusEl.textContent = 'Critical';
-            }
-        }
-        
-        async function updateEvents() {
-            try {
-                const response = await fetch('/api/events?hours=24');
-                const result = await response.json();
-                
-                if (result.success) {
-                    const container = document.getElementById('events-container');
-                    
-                    if (result.data.length === 0) {
-                        container.innerHTML = '<div style="text-align: center; padding: 20px; color: #666;">No recent events</div>';
-                        return;
-                    }
-                    
-                    container.innerHTML = result.data.slice(0, 10).map(event => `
-                        <div class="event-item event-${event.severity}">
-                            <strong>${event.severity.toUpperCase()}</strong>: ${event.description}
-                            <div style="color: #666; font-size: 0.9em; margin-top: 5px;">
-                                ${new Date(event.timestamp).toLocaleString()}
-                            </div>
-                        </div>
-                    `).join('');
-                }
-            } catch (error) {
-                console.error('Error fetching events:', error);
-            }
-        }
-        
-        updateReadings();
-        updateEvents();
-        setInterval(updateReadings, UPDATE_INTERVAL);
-        setInterval(updateEvents, UPDATE_INTERVAL * 2);
-    </script>
+    <script src="/static/dashboard.js?v={js_version}"></script>
 </body>
 </html>
 """
 
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Encode jsonify() responses with orjson straight to bytes"""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=str, option=orjson.OPT_NAIVE_UTC).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=str, option=orjson.OPT_NAIVE_UTC),
+            mimetype=self.mimetype
+        )
+
+EVENTS_FRAGMENT_TEMPLATE = """
+{%- for event in events -%}
+<div class="event-item event-{{ event.severity }}">
+    <strong>{{ event.severity | upper }}</strong>: {{ event.description }}
+    <div class="event-time">{{ event.timestamp }}</div>
+</div>
+{%- else -%}
+<div class="placeholder">No recent events</div>
+{%- endfor -%}
+"""
+
+
+def _asset_version(filename):
+    """Short content hash used to version a static asset URL"""
+    return hashlib.sha256((STATIC_DIR / filename).read_bytes()).hexdigest()[:12]
+
+
+# The page only needs the asset versions filled in, so it is built, encoded
+# and compressed once and sent as-is
+_INDEX_HTML = HTML_TEMPLATE.format(
+    css_version=_asset_version('dashboard.css'),
+    js_version=_asset_version('dashboard.js')
+).encode('utf-8')
+_INDEX_ETAG = hashlib.sha256(_INDEX_HTML).hexdigest()[:16]
+_INDEX_GZIP = gzip.compress(_INDEX_HTML, compresslevel=9)
+_INDEX_BROTLI = brotli.compress(_INDEX_HTML) if HAS_BROTLI else None
+
+
+def _current_payload(monitor):
+    """Read and classify the sensors; None if the read failed"""
+    readings = monitor.sensor_manager.read_all()
+    if not readings:
+        return None
+    classification = monitor.classifier.classify(readings)
+    readings['quality_class'] = classification['class']
+    readings['quality_score'] = classification['score']
+    return readings
+
+
+def _readings_changed(readings, last):
+    """True if readings differ meaningfully from the last pushed readings"""
+    if last is None or readings.get('quality_class') != last.get('quality_class'):
+        return True
+    for key, epsilon in STREAM_EPSILON.items():
+        value, previous = readings.get(key), last.get(key)
+        if value is None or previous is None:
+            if value is not previous:
+                return True
+        elif abs(value - previous) > epsilon:
+            return True
+    return False
+
+
+def _parse_hours():
+    """The ?hours= argument clamped to HOURS_RANGE, or None if it is not an integer"""
+    value = request.args.get('hours')
+    if value is None:
+        return DEFAULT_HOURS
+    if not _INTEGER_RE.fullmatch(value):
+        return None
+    low, high = HOURS_RANGE
+    return max(low, min(high, int(value)))
+
+
+def _events_payload(monitor, start):
+    """Events since start, newest first, as plain dicts"""
+    events = monitor.data_handler.get_events(start_date=start, limit=100)
+    return [dict(row) for row in events]
+
+
 def create_app(monitor):
     app = Flask(__name__)
     app.config['monitor'] = monitor
+    app.config['SEND_FILE_MAX_AGE_DEFAULT'] = STATIC_MAX_AGE
+    if HAS_ORJSON:
+        app.json = OrjsonProvider(app)
+    
+    if HAS_FLASK_COMPRESS:
+        # JSON responses are compressed on the fly; /api/stream must not be
+        # buffered by the compressor
+        app.config['COMPRESS_STREAMS'] = False
+        Compress(app)
+    
+    # Concurrent callers wait on the lock and then reuse the fresh reading
+    current_cache = {'time': 0.0, 'readings': None}
+    current_lock = threading.Lock()
+    
+    def current_readings():
+        with current_lock:
+            if (current_cache['readings'] is not None
+                    and time.monotonic() - current_cache['time'] < CURRENT_TTL):
+                return current_cache['readings']
+            readings = _current_payload(monitor)
+            if readings:
+                current_cache['readings'] = readings
+                current_cache['time'] = time.monotonic()
+            return readings
+    
+    # Event lists are queried once per window length and reused until the
+    # events table changes
+    events_cache = {}
+    events_lock = threading.Lock()
+    
+    def events_key():
+        """Changes whenever events are added or purged"""
+        return monitor.data_handler.get_event_id_range()
+    
+    def recent_events(hours, key=None):
+        if key is None:
+            key = events_key()
+        with events_lock:
+            cached = events_cache.get(hours)
+            if cached is not None and cached[0] == key:
+                return cached[1]
+        
+        start = datetime.now() - timedelta(hours=hours)
+        events = _events_payload(monitor, start)
+        with events_lock:
+            events_cache[hours] = (key, events)
+        return events
+    
+    # One broadcaster thread reads the sensors for every /api/stream client;
+    # it runs only while at least one client is connected
+    subscribers = set()
+    subscribers_lock = threading.Lock()
+    stream_state = {'thread': None, 'latest': {}}
+    
+    # Compiled once; autoescaped, since descriptions end up in the page
+    events_template = app.jinja_env.from_string(EVENTS_FRAGMENT_TEMPLATE)
+    
+    def events_html(hours):
+        return events_template.render(events=recent_events(hours)[:EVENTS_SHOWN])
+    
+    def events_etag(key):
+        return '-'.join(str(part) for part in key)
+    
+    def client_has(etag):
+        """Whether the request's If-None-Match names etag"""
+        # flask_compress appends ":<encoding>" to the ETags of responses it compresses
+        return any(tag.split(':', 1)[0] == etag for tag in request.if_none_match.as_set())
+    
+    def events_response(hours, build):
+        """Answer with build(events), or 304 if the client's ETag is still current"""
+        key = events_key()
+        etag = events_etag(key)
+        if client_has(etag):
+            response = Response(status=304)
+        else:
+            response = build(recent_events(hours, key))
+        response.set_etag(etag)
+        return response
+    
+    # Lets a request run its database query while it reads the sensors
+    io_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='dashboard-io')
+    
+    def publish(name, frame):
+        """Send an SSE frame to every client and keep it for new ones"""
+        with subscribers_lock:
+            stream_state['latest'][name] = frame
+            for subscriber in subscribers:
+                try:
+                    subscriber.put_nowait(frame)
+                except queue.Full:
+                    pass  # Slow client; it gets the next update
+    
+    def broadcast():
+        interval = monitor.settings.measurement_interval
+        events_marker = None
+        last_readings = None
+        while True:
+            with subscribers_lock:
+                if not subscribers:
+                    stream_state['thread'] = None
+                    stream_state['latest'] = {}
+                    return
+            
+            try:
+                readings = current_readings()
+                if readings and _readings_changed(readings, last_readings):
+                    message = app.json.dumps({'success': True, 'data': readings})
+                    publish('readings', f"data: {message}\n\n")
+                    last_readings = readings
+                
+                # The event id range only moves when events are added or purged
+                marker = monitor.data_handler.get_event_id_range()
+                if marker != events_marker:
+                    html = app.json.dumps(events_html(DEFAULT_HOURS))
+                    publish('events', f"event: events\ndata: {html}\n\n")
+                    events_marker = marker
+            except Exception as e:
+                logger.error(f"Stream update failed: {e}")
+            time.sleep(interval)
+    
+    def subscribe():
+        subscriber = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+        with subscribers_lock:
+            subscribers.add(subscriber)
+            for frame in stream_state['latest'].values():
+                subscriber.put_nowait(frame)
+            if stream_state['thread'] is None:
+                stream_state['thread'] = threading.Thread(target=broadcast, name='sse-broadcast', daemon=True)
+                stream_state['thread'].start()
+        return subscriber
+    
+    def unsubscribe(subscriber):
+        with subscribers_lock:
+            subscribers.discard(subscriber)
     
     @app.route('/')
     def index():
-        return render_template_string(HTML_TEMPLATE)
+        accepted = request.accept_encodings
+        if _INDEX_BROTLI is not None and accepted['br']:
+            body, encoding = _INDEX_BROTLI, 'br'
+        elif accepted['gzip']:
+            body, encoding = _INDEX_GZIP, 'gzip'
+        else:
+            body, encoding = _INDEX_HTML, None
+        
+        response = Response(body, mimetype='text/html')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        # Revalidated on every load, so new asset versions are picked up
+        response.set_etag(f"{_INDEX_ETAG}-{encoding or 'identity'}")
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+    
+    @app.after_request
+    def revalidate_static(response):
+        if request.path.startswith(app.static_url_path + '/'):
+            response.cache_control.must_revalidate = True
+        return response
     
     @app.route('/api/current')
     def get_current():
         try:
-            readings = monitor.sensor_manager.read_all()
+            readings = current_readings()
             if readings:
-                classification = monitor.classifier.classify(readings)
-                readings['quality_class'] = classification['class']
-                readings['quality_score'] = classification['score']
                 return jsonify({'success': True, 'data': readings})
             return jsonify({'success': False, 'error': 'Failed to read sensors'}), 500
         except Exception as e:
             return jsonify({'success': False, 'error': str(e)}), 500
     
+    @app.route('/api/stream')
+    def stream():
+        """Push /api/current payloads, and the events fragment when it changes, as server-sent events"""
+        def events():
+            subscriber = subscribe()
+            try:
+                while True:
+                    try:
+                        frame = subscriber.get(timeout=STREAM_KEEPALIVE)
+                    except queue.Empty:
+                        yield ': keepalive\n\n'
+                        continue
+                    yield frame
+            finally:
+                unsubscribe(subscriber)
+        
+        return Response(events(), mimetype='text/event-stream',
+                         headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    
     @app.route('/api/history')
     def get_history():
+        """
+        Stream readings from the last hours as they come off the cursor
+        
+        Sent as the usual {"success": true, "data": [...]} document, or as
+        one JSON object per line when the client accepts application/x-ndjson.
+        """
+        hours = _parse_hours()
+        if hours is None:
+            return jsonify({'success': False, 'error': 'hours must be an integer'}), 400
+        
         try:
-            hours = int(request.args.get('hours', 24))
             start = datetime.now() - timedelta(hours=hours)
-            readings = monitor.data_handler.get_readings(start_date=start, limit=1000)
-            return jsonify({'success': True, 'data': readings})
+            rows = monitor.data_handler.iter_readings(start_date=start, limit=HISTORY_LIMIT)
+            # The query runs on the first row; fail here, before any headers are sent
+            first = next(rows, None)
         except Exception as e:
             return jsonify({'success': False, 'error': str(e)}), 500
+        
+        if first is not None:
+            rows = chain((first,), rows)
+        dumps = app.json.dumps
+        best = request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson'])
+        
+        if best == 'application/x-ndjson':
+            def chunks():
+                try:
+                    for row in rows:
+                        yield dumps(dict(row)) + '\n'
+                except Exception as e:
+                    logger.error(f"History stream failed: {e}")
+            return Response(stream_with_context(chunks()), mimetype='application/x-ndjson')
+        
+        def chunks():
+            # success goes last, once it is known whether every row was sent
+            yield '{"data": ['
+            separator = ''
+            try:
+                for row in rows:
+                    yield separator + dumps(dict(row))
+                    separator = ','
+            except Exception as e:
+                logger.error(f"History stream failed: {e}")
+                yield '], ' + dumps({'success': False, 'error': str(e)})[1:]
+                return
+            yield '], "success": true}'
+        return Response(stream_with_context(chunks()), mimetype='application/json')
     
     @app.route('/api/events')
     def get_events():
+        hours = _parse_hours()
+        if hours is None:
+            return jsonify({'success': False, 'error': 'hours must be an integer'}), 400
+        
         try:
-            hours = int(request.args.get('hours', 24))
-            start = datetime.now() - timedelta(hours=hours)
-            events = monitor.data_handler.get_events(start_date=start, limit=100)
-            return jsonify({'success': True, 'data': events})
+            return events_response(hours, lambda events: jsonify({'success': True, 'data': events}))
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+    
+    @app.route('/api/events_fragment')
+    def get_events_fragment():
+        """Recent events rendered as the dashboard's HTML list"""
+        hours = _parse_hours()
+        if hours is None:
+            return Response('hours must be an integer', status=400, mimetype='text/plain')
+        
+        try:
+            return events_response(hours, lambda events: Response(
+                events_template.render(events=events[:EVENTS_SHOWN]), mimetype='text/html'
+            ))
+        except Exception as e:
+            return Response(str(e), status=500, mimetype='text/plain')
+    
+    @app.route('/api/bootstrap')
+    def get_bootstrap():
+        """
+        Current readings and recent events in one response
+        
+        The ETag covers the events only. While the client's If-None-Match
+        still matches, events and events_html are left out, so a polling
+        client revalidates its events list in the same request that
+        fetches the readings.
+        """
+        hours = _parse_hours()
+        if hours is None:
+            return jsonify({'success': False, 'error': 'hours must be an integer'}), 400
+        
+        try:
+            key = events_key()
+            etag = events_etag(key)
+            if client_has(etag):
+                payload = {'success': True, 'current': current_readings()}
+            else:
+                events = io_pool.submit(recent_events, hours, key)
+                current = current_readings()
+                events = events.result()
+                payload = {
+                    'success': True,
+                    'current': current,
+                    'events': events,
+                    'events_html': events_template.render(events=events[:EVENTS_SHOWN])
+                }
+            response = jsonify(payload)
+            response.set_etag(etag)
+            # The body also carries readings, so it must never be reused from a cache
+            response.headers['Cache-Control'] = 'no-store'
+            return response
         except Exception as e:
             return jsonify({'success': False, 'error': str(e)}), 500
     
@@ -0,0 +1,70 @@
+"""Tests for water quality analyzer"""
+import sys
+sys.path.insert(0, '..')
+import pytest
+from src.analyzer import WaterQualityAnalyzer, _RingBuffer, HISTORY_SIZE, HISTORY_DTYPE
+
+THRESHOLDS = {
+    'pH': {'excellent': [6.5, 8.5]},
+    'turbidity': {'excellent': [0, 5]},
+    'temperature': {'excellent': [15, 25]}
+}
+
+def test_ring_buffer_tail_wraps_around():
+    history = _RingBuffer(4)
+    for value in range(6):
+        history.append(float(value))
+    assert len(history) == 4
+    assert history.tail(3).tolist() == [3.0, 4.0, 5.0]
+    assert history.values().tolist() == [2.0, 3.0, 4.0, 5.0]
+    assert history.mean() == 3.5
+
+def test_history_is_one_contiguous_array():
+    analyzer = WaterQualityAnalyzer(THRESHOLDS)
+    buf = analyzer.pH_history.buf
+    assert buf.flags['C_CONTIGUOUS']
+    assert buf.dtype == HISTORY_DTYPE
+    assert buf.shape == (HISTORY_SIZE,)
+    assert buf.nbytes == HISTORY_SIZE * 8
+
+def test_normal_readings_raise_no_events():
+    analyzer = WaterQualityAnalyzer(THRESHOLDS)
+    for _ in range(40):
+        assert analyzer.analyze({'pH': 7.2, 'turbidity': 4.0, 'temperature': 20.0}) == []
+
+def test_rapid_pH_change_detected():
+    analyzer = WaterQualityAnalyzer(THRESHOLDS)
+    for pH in [7.0, 7.0, 7.0, 7.0, 7.0]:
+        analyzer.analyze({'pH': pH, 'turbidity': 4.0, 'temperature': 20.0})
+    events = analyzer.analyze({'pH': 7.8, 'turbidity': 4.0, 'temperature': 20.0})
+    assert [e['event_type'] for e in events] == ['pH_rapid_change']
+
+def test_pollution_event_detected():
+    analyzer = WaterQualityAnalyzer(THRESHOLDS)
+    events = analyzer.analyze({'pH': 4.5, 'turbidity': 150.0, 'temperature': 35.0})
+    types = {e['event_type'] for e in events}
+    assert {'pH_critical_low', 'turbidity_critical', 'multi_parameter_degradation'} <= types
+
+def test_analyze_batch_matches_analyze():
+    series = [7.0] * 5 + [7.8, 4.5, 7.0, 10.5, 9.7]
+    analyzer = WaterQualityAnalyzer(THRESHOLDS)
+    analyzer.event_cooldown = 0
+    expected = []
+    for pH in series:
+        for event in analyzer.analyze({'pH': pH, 'turbidity': 4.0, 'temperature': 20.0}):
+            expected.append((event['event_type'], event['description']))
+    batch = WaterQualityAnalyzer(THRESHOLDS).analyze_batch({
+        'pH': series, 'turbidity': [4.0] * len(series), 'temperature': [20.0] * len(series)
+    })
+    assert [(e['event_type'], e['description']) for e in batch] == expected
+
+def test_analyze_batch_timestamps_ignore_dataframe_index():
+    pd = pytest.importorskip('pandas')
+    frame = pd.DataFrame({
+        'pH': [7.0, 4.5, 7.0],
+        'turbidity': [4.0, 4.0, 4.0],
+        'temperature': [20.0, 20.0, 20.0],
+        'timestamp': pd.date_range('2024-01-01', periods=3, freq='min')
+    }, index=[10, 20, 30])
+    events = WaterQualityAnalyzer(THRESHOLDS).analyze_batch(frame)
+    assert [e['timestamp'] for e in events] == [frame['timestamp'].iloc[1]]
@@ -1,25 +1,50 @@
 """Tests for water quality classifier"""
 import sys
 sys.path.insert(0, '..')
-from src.classifier import WaterQualityClassifier
+import numpy as np
+import pytest
+from src.classifier import WaterQualityClassifier, CLASS_NAME
 
-def test_excellent_quality():
-    thresholds = {
-        'pH': {'excellent': [6.5, 8.5]},
-        'turbidity': {'excellent': [0, 5]},
-        'temperature': {'excellent': [15, 25]}
-    }
-    classifier = WaterQualityClassifier(thresholds)
-    result = classifier.classify({'pH': 7.2, 'turbidity': 3.0, 'temperature': 20.0})
-    assert result['class'] == 'excellent'
-    assert result['score'] >= 80
-
-def test_poor_quality():
-    thresholds = {
+@pytest.fixture(scope='module')
+def classifier():
+    return WaterQualityClassifier({
         'pH': {'excellent': [6.5, 8.5], 'good': [6.0, 9.0]},
         'turbidity': {'excellent': [0, 5], 'good': [5, 10]},
         'temperature': {'excellent': [15, 25], 'good': [10, 30]}
-    }
-    classifier = WaterQualityClassifier(thresholds)
-    result = classifier.classify({'pH': 5.0, 'turbidity': 50.0, 'temperature': 35.0})
-    assert result['class'] in ['poor', 'critical']
+    })
+
+@pytest.fixture(scope='module')
+def default_classifier():
+    return WaterQualityClassifier({})
+
+@pytest.mark.parametrize("reading,expected,min_score", [
+    ({'pH': 7.2, 'turbidity': 3.0, 'temperature': 20.0}, {'excellent'}, 80),
+    ({'pH': 5.0, 'turbidity': 50.0, 'temperature': 35.0}, {'poor', 'critical'}, 0)
+])
+def test_quality(classifier, reading, expected, min_score):
+    result = classifier.classify(reading)
+    assert result['class'] in expected
+    assert result['score'] >= min_score
+
+def test_range_boundaries(default_classifier):
+    assert CLASS_NAME[default_classifier._classify_pH(8.5)] == 'excellent'
+    assert CLASS_NAME[default_classifier._classify_pH(5.0)] == 'poor'
+    assert CLASS_NAME[default_classifier._classify_pH(4.99)] == 'critical'
+    assert CLASS_NAME[default_classifier._classify_turbidity(5)] == 'good'
+    assert CLASS_NAME[default_classifier._classify_turbidity(100)] == 'critical'
+    assert CLASS_NAME[default_classifier._classify_temperature(40)] == 'poor'
+    assert CLASS_NAME[default_classifier._classify_temperature(40.01)] == 'critical'
+
+def test_classify_batch_matches_classify(default_classifier):
+    readings = [
+        {'pH': 7.2, 'turbidity': 3.0, 'temperature': 20.0},
+        {'pH': 5.0, 'turbidity': 50.0, 'temperature': 35.0},
+        {'pH': 4.5, 'turbidity': 150.0, 'temperature': 42.0}
+    ]
+    batch = default_classifier.classify_batch({
+        key: np.array([r[key] for r in readings]) for key in ('pH', 'turbidity', 'temperature')
+    })
+    for i, reading in enumerate(readings):
+        result = default_classifier.classify(reading)
+        assert batch['class'][i] == result['class']
+        assert batch['score'][i] == result['score']
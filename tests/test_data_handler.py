@@ -0,0 +1,53 @@
+"""Tests for data handler"""
+import sys
+sys.path.insert(0, '..')
+import sqlite3
+from src.data_handler import DataHandler, MAX_FLUSH_ATTEMPTS
+
+def test_statistics_returns_aggregates(tmp_path):
+    handler = DataHandler(str(tmp_path / 'test.db'))
+    handler.save_reading({'pH': 7.0, 'turbidity': 2.0, 'temperature': 20.0})
+    handler.save_reading({'pH': 8.0, 'turbidity': 4.0, 'temperature': 22.0})
+    stats = handler.get_statistics()
+    handler.close()
+    assert stats['count'] == 2
+    assert stats['avg_pH'] == 7.5
+    assert stats['max_turbidity'] == 4.0
+
+
+def test_recent_statistics_match_database(tmp_path):
+    handler = DataHandler(str(tmp_path / 'test.db'))
+    handler.save_reading({'pH': 7.0, 'turbidity': 2.0, 'temperature': 20.0})
+    handler.save_reading({'pH': 8.0, 'turbidity': None, 'temperature': 22.0})
+    recent = handler.recent_statistics()
+    stats = handler.get_statistics()
+    handler.close()
+    assert recent == stats
+
+
+def test_failed_flushes_drop_readings_after_retry_limit(tmp_path):
+    db_path = str(tmp_path / 'test.db')
+    handler = DataHandler(db_path, flush_interval=3600)
+    other = sqlite3.connect(db_path)
+    other.execute("DROP TABLE readings")
+    other.close()
+    handler.save_reading({'pH': 7.0, 'turbidity': 2.0, 'temperature': 20.0})
+    for _ in range(MAX_FLUSH_ATTEMPTS):
+        assert not handler.flush()
+    assert handler.flush()
+    assert handler.dropped_readings == 1
+    handler.close()
+
+
+def test_flush_inside_transaction_leaves_readings_queued(tmp_path):
+    handler = DataHandler(str(tmp_path / 'test.db'), flush_interval=3600)
+    handler.save_reading({'pH': 7.0, 'turbidity': 2.0, 'temperature': 20.0})
+    try:
+        with handler.transaction():
+            handler.get_statistics()
+            raise RuntimeError("abort")
+    except RuntimeError:
+        pass
+    stats = handler.get_statistics()
+    handler.close()
+    assert stats['count'] == 1